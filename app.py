@@ -1,5 +1,6 @@
 import os
 import logging
+import tempfile
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
@@ -7,6 +8,7 @@ from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime
 import humanize
+from sandbox import default_workspace_root
 
 
 class Base(DeclarativeBase):
@@ -35,6 +37,47 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+# configure test data storage (see storage.py)
+app.config['TESTDATA_STORAGE'] = os.environ.get('TESTDATA_STORAGE', 'local')  # local or s3
+app.config['TESTDATA_DIR'] = os.environ.get('TESTDATA_DIR', 'testdata')
+app.config['TESTDATA_S3_BUCKET'] = os.environ.get('TESTDATA_S3_BUCKET')
+app.config['TESTDATA_S3_PREFIX'] = os.environ.get('TESTDATA_S3_PREFIX', 'testdata/')
+app.config['TESTDATA_S3_ENDPOINT'] = os.environ.get('TESTDATA_S3_ENDPOINT')  # for S3-compatible services
+
+# configure the scoreboard cache (see scoreboard.py)
+app.config['SCOREBOARD_VERSION_CHECK_INTERVAL'] = float(os.environ.get('SCOREBOARD_VERSION_CHECK_INTERVAL', 1.0))  # seconds
+
+# configure live submission updates (see notifier.py)
+app.config['NOTIFIER_POLL_INTERVAL'] = float(os.environ.get('NOTIFIER_POLL_INTERVAL', 0.5))  # seconds
+
+# configure judging (see judge_worker.py)
+app.config['JUDGE_WORKERS'] = int(os.environ.get('JUDGE_WORKERS', os.cpu_count() or 2))
+app.config['JUDGE_POLL_INTERVAL'] = float(os.environ.get('JUDGE_POLL_INTERVAL', 1.0))  # seconds
+app.config['JUDGE_HOST_ID'] = os.environ.get('JUDGE_HOST_ID')  # defaults to hostname:pid
+app.config['JUDGE_HEARTBEAT_INTERVAL'] = float(os.environ.get('JUDGE_HEARTBEAT_INTERVAL', 10))  # seconds
+app.config['JUDGE_STALE_TIMEOUT'] = int(os.environ.get('JUDGE_STALE_TIMEOUT', 60))  # seconds without a heartbeat
+app.config['JUDGE_STARVATION_TIMEOUT'] = int(os.environ.get('JUDGE_STARVATION_TIMEOUT', 30))  # seconds before lower lanes get a judge
+app.config['JUDGE_PARALLEL_TESTS'] = int(os.environ.get('JUDGE_PARALLEL_TESTS', 0))  # per judge process, 0 runs tests sequentially
+app.config['JUDGE_WALL_TIME_FACTOR'] = float(os.environ.get('JUDGE_WALL_TIME_FACTOR', 3.0))  # wall clock cap / CPU limit
+app.config['JUDGE_MEMORY_SLACK'] = int(os.environ.get('JUDGE_MEMORY_SLACK', 64))  # MB of address space (RSS for Java) over the memory limit
+app.config['JUDGE_OUTPUT_LIMIT'] = int(os.environ.get('JUDGE_OUTPUT_LIMIT', 64))  # MB a program may write
+app.config['JUDGE_CHECKER_TIMEOUT'] = float(os.environ.get('JUDGE_CHECKER_TIMEOUT', 10))  # seconds per test
+app.config['JUDGE_PYTHON_ZYGOTE'] = os.environ.get('JUDGE_PYTHON_ZYGOTE', '') == '1'  # fork Python runs from a warm interpreter
+app.config['JUDGE_JAVA_CDS_ARCHIVE'] = os.environ.get(
+    'JUDGE_JAVA_CDS_ARCHIVE', os.path.join(tempfile.gettempdir(), 'cms-java.jsa'))
+# Per-language factors applied to Problem.time_limit, e.g. "java=1.5,python3=2"
+app.config['JUDGE_TIME_MULTIPLIERS'] = {
+    language: float(factor)
+    for language, factor in (item.split('=') for item in os.environ.get('JUDGE_TIME_MULTIPLIERS', '').split(',') if item)
+}
+app.config['JUDGE_WORKSPACE_ROOT'] = os.environ.get('JUDGE_WORKSPACE_ROOT', default_workspace_root())
+app.config['JUDGE_WORKSPACES'] = int(os.environ.get('JUDGE_WORKSPACES', 16))  # pre-created, grows on demand
+app.config['JUDGE_TESTDATA_CACHE_DIR'] = os.environ.get(
+    'JUDGE_TESTDATA_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'cms-testdata'))
+app.config['JUDGE_ARTIFACT_CACHE_DIR'] = os.environ.get(
+    'JUDGE_ARTIFACT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'cms-artifacts'))
+app.config['JUDGE_ARTIFACT_CACHE_SIZE'] = int(os.environ.get('JUDGE_ARTIFACT_CACHE_SIZE', 1024))  # MB, 0 disables
+
 # initialize extensions
 db.init_app(app)
 login_manager.init_app(app)
@@ -51,6 +94,13 @@ with app.app_context():
     # Import models to ensure tables are created
     import models
     db.create_all()
+
+    # Add columns introduced since the database was created
+    from migrations import upgrade_schema, migrate_test_data, migrate_rejudge_batches, check_scoreboard
+    upgrade_schema()
+    migrate_test_data()
+    migrate_rejudge_batches()
+    check_scoreboard()
     
     # Create admin
 
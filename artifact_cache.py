@@ -0,0 +1,97 @@
+"""Content-addressed cache of compiled submissions.
+
+Build outputs are stored on local disk under a key derived from the
+language, the compile command and the source code, so resubmissions and
+rejudges of identical code skip the compiler. The least recently used
+entries are evicted once the cache grows beyond its size limit.
+"""
+import glob
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+
+class ArtifactCache:
+    """LRU, size-bounded cache of compiled artifacts on local disk"""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def make_key(language, compile_command, source):
+        digest = hashlib.sha256()
+        for part in (language, '\0'.join(compile_command), source):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def fetch(self, key, dest_dir):
+        """Copy cached artifacts into dest_dir, returning True on a hit"""
+        entry_dir = self._entry_dir(key)
+        try:
+            for name in os.listdir(entry_dir):
+                shutil.copy2(os.path.join(entry_dir, name), dest_dir)
+            os.utime(entry_dir)  # mark as recently used
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return False
+
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key, build_dir, patterns):
+        """Store the files in build_dir matching any of patterns under key"""
+        files = [path for pattern in patterns
+                 for path in glob.glob(os.path.join(build_dir, pattern))]
+        if not files:
+            return
+
+        # Populate a private directory first so readers never see partial entries
+        staging_dir = tempfile.mkdtemp(prefix='.staging-', dir=self.root)
+        try:
+            for path in files:
+                shutil.copy2(path, staging_dir)
+            os.rename(staging_dir, self._entry_dir(key))
+        except OSError:
+            # Another worker stored the same entry first
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes"""
+        entries = []
+        total_size = 0
+        for name in os.listdir(self.root):
+            if name.startswith('.'):
+                continue
+            entry_dir = self._entry_dir(name)
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+                entries.append((os.stat(entry_dir).st_mtime, size, entry_dir))
+            except OSError:
+                continue
+            total_size += size
+
+        for _, size, entry_dir in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
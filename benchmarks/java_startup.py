@@ -0,0 +1,52 @@
+"""Benchmark Java test-run startup: default JVM vs the judge's tuned JVM.
+
+Runs the warm-up solution from jvm.py repeatedly with a plain
+`java -cp` command and with the judge's options and class-data sharing
+archive, and reports the mean wall and CPU time per run.
+
+    python benchmarks/java_startup.py [--runs 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jvm import build_class_data_archive, java_options
+from sandbox import run_process
+
+
+def measure(cmd, runs, work_dir):
+    wall_times, cpu_times = [], []
+    for _ in range(runs):
+        result = run_process(cmd, os.devnull, os.devnull, os.path.join(work_dir, 'err'), timeout=30)
+        assert result['returncode'] == 0, result
+        wall_times.append(result['wall_time'])
+        cpu_times.append(result['cpu_time'])
+    return statistics.mean(wall_times), statistics.mean(cpu_times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        archive = os.path.join(work_dir, 'classes.jsa')
+        build_class_data_archive(archive, work_dir)
+
+        results = {
+            'default JVM': measure(['java', '-cp', work_dir, 'Solution'], args.runs, work_dir),
+            'tuned JVM + CDS': measure(['java'] + java_options(archive) + ['-cp', work_dir, 'Solution'],
+                                       args.runs, work_dir),
+        }
+
+    print(f'{args.runs} runs')
+    for name, (mean_wall, mean_cpu) in results.items():
+        print(f'{name:>16}: {mean_wall * 1000:7.1f} ms wall, {mean_cpu * 1000:7.1f} ms CPU per run')
+
+
+if __name__ == '__main__':
+    main()
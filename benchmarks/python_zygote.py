@@ -0,0 +1,79 @@
+"""Benchmark Python 3 test-run startup: fresh interpreter vs zygote fork.
+
+Runs a small solution against a 50-test problem both ways with the judge's
+sandbox limits and reports the mean wall and CPU time per test run.
+
+    python benchmarks/python_zygote.py [--tests 50]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sandbox import run_process
+from zygote import PYTHON, ZygotePool
+
+SOLUTION = '''\
+import sys
+from collections import Counter
+numbers = list(map(int, sys.stdin.read().split()))
+print(sum(numbers), Counter(numbers).most_common(1)[0][0])
+'''
+
+LIMITS = {'timeout': 10, 'cpu_limit': 5, 'address_space': 320 * 1024 * 1024,
+          'output_limit': 64 * 1024 * 1024}
+
+
+def measure(run, inputs, work_dir):
+    wall_times, cpu_times = [], []
+    for input_file in inputs:
+        result = run(input_file, os.path.join(work_dir, 'out'), os.path.join(work_dir, 'err'))
+        assert result['returncode'] == 0, result
+        wall_times.append(result['wall_time'])
+        cpu_times.append(result['cpu_time'])
+    return sum(wall_times), statistics.mean(wall_times), statistics.mean(cpu_times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tests', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = os.path.join(work_dir, 'solution.py')
+        with open(source, 'w') as f:
+            f.write(SOLUTION)
+
+        inputs = []
+        for i in range(args.tests):
+            input_file = os.path.join(work_dir, f'input{i}.txt')
+            with open(input_file, 'w') as f:
+                f.write(' '.join(str(n % 97) for n in range(i * 100 + 1)) + '\n')
+            inputs.append(input_file)
+
+        pool = ZygotePool()
+        pool.run(source, inputs[0], os.devnull, os.devnull, **LIMITS)  # start the zygote
+
+        results = {
+            'fresh interpreter': measure(
+                lambda stdin, stdout, stderr: run_process([PYTHON, source], stdin, stdout, stderr, **LIMITS),
+                inputs, work_dir),
+            'zygote fork': measure(
+                lambda stdin, stdout, stderr: pool.run(source, stdin, stdout, stderr, **LIMITS),
+                inputs, work_dir),
+        }
+        pool.close()
+
+    print(f'{args.tests} test runs')
+    for name, (total_wall, mean_wall, mean_cpu) in results.items():
+        print(f'{name:>18}: total {total_wall * 1000:8.1f} ms, '
+              f'per test {mean_wall * 1000:6.2f} ms wall, {mean_cpu * 1000:6.2f} ms CPU')
+    fresh, forked = results['fresh interpreter'][0], results['zygote fork'][0]
+    print(f'{"saved":>18}: {(fresh - forked) * 1000:8.1f} ms ({fresh / forked:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark the hot submission queries with and without the Submission indexes.
+
+Fills a SQLite database with synthetic submissions, times the queries the
+dashboard, submissions, profile, problem, admin and judge queue pages run,
+then creates the indexes declared on models.Submission and times them again.
+
+    python benchmarks/submission_indexes.py [--rows 1000000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Mirrors Submission.__table_args__ in models.py
+INDEXES = {
+    'ix_submission_user_submitted': ('user_id', 'submitted_at'),
+    'ix_submission_problem_status': ('problem_id', 'status'),
+    'ix_submission_user_problem_status': ('user_id', 'problem_id', 'status'),
+    'ix_submission_status': ('status',),
+    'ix_submission_submitted': ('submitted_at',),
+    'ix_submission_problem_submitted': ('problem_id', 'submitted_at'),
+}
+
+STATUSES = ['accepted'] * 30 + ['wrong_answer'] * 40 + ['time_limit'] * 12 + \
+           ['runtime_error'] * 10 + ['compile_error'] * 8
+
+# (page, query); :user and :problem are picked at random for every run
+QUERIES = [
+    ('dashboard recent', 'SELECT * FROM submission WHERE user_id = :user '
+                         'ORDER BY submitted_at DESC LIMIT 5'),
+    ('submissions page', 'SELECT * FROM submission WHERE user_id = :user '
+                         'ORDER BY submitted_at DESC LIMIT 20 OFFSET 20'),
+    ('profile counts', 'SELECT COUNT(*), SUM(status = \'accepted\') FROM submission WHERE user_id = :user'),
+    ('problems solved', 'SELECT DISTINCT problem_id FROM submission '
+                        'WHERE user_id = :user AND status = \'accepted\''),
+    ('problem detail', 'SELECT id FROM submission WHERE user_id = :user AND problem_id = :problem '
+                       'AND status = \'accepted\' LIMIT 1'),
+    ('problem accepted', 'SELECT COUNT(*) FROM submission WHERE problem_id = :problem '
+                         'AND status = \'accepted\''),
+    ('admin pending', 'SELECT COUNT(*) FROM submission WHERE status = \'pending\''),
+    ('admin list', 'SELECT * FROM submission ORDER BY submitted_at DESC LIMIT 50'),
+    ('judge queue', 'SELECT id FROM submission WHERE status = \'pending\' '
+                    'ORDER BY submitted_at, id LIMIT 10'),
+]
+
+
+def populate(connection, rows, users, problems):
+    connection.execute('''
+        CREATE TABLE submission (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            problem_id INTEGER NOT NULL,
+            language VARCHAR(20) NOT NULL,
+            code TEXT NOT NULL,
+            status VARCHAR(20),
+            score INTEGER,
+            execution_time INTEGER,
+            submitted_at DATETIME
+        )
+    ''')
+
+    start = datetime(2025, 1, 1)
+    step = timedelta(days=365) / rows
+    batch = []
+    for i in range(rows):
+        # The newest submissions are still waiting for the judge
+        status = 'pending' if i >= rows - 50 else random.choice(STATUSES)
+        batch.append((random.randrange(users), random.randrange(problems), 'cpp',
+                      'int main() { return 0; }', status, random.choice([0, 30, 100]),
+                      random.randrange(1000), (start + step * i).isoformat(' ')))
+        if len(batch) == 10000:
+            connection.executemany('INSERT INTO submission (user_id, problem_id, language, code, status, '
+                                   'score, execution_time, submitted_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                   batch)
+            batch = []
+    if batch:
+        connection.executemany('INSERT INTO submission (user_id, problem_id, language, code, status, '
+                               'score, execution_time, submitted_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                               batch)
+    connection.commit()
+
+
+def measure(connection, repeat, users, problems):
+    results = {}
+    for name, query in QUERIES:
+        rng = random.Random(name)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            connection.execute(query, {'user': rng.randrange(users),
+                                       'problem': rng.randrange(problems)}).fetchall()
+        results[name] = (time.perf_counter() - start) / repeat
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--problems', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        connection = sqlite3.connect(os.path.join(work_dir, 'bench.db'))
+        populate(connection, args.rows, args.users, args.problems)
+        before = measure(connection, args.repeat, args.users, args.problems)
+
+        start = time.perf_counter()
+        for name, columns in INDEXES.items():
+            connection.execute(f'CREATE INDEX {name} ON submission ({", ".join(columns)})')
+        connection.execute('ANALYZE')
+        index_time = time.perf_counter() - start
+
+        after = measure(connection, args.repeat, args.users, args.problems)
+        connection.close()
+
+    print(f'{args.rows} submissions, {args.users} users, {args.problems} problems, '
+          f'{args.repeat} runs per query; indexes built in {index_time:.1f} s')
+    for name, _ in QUERIES:
+        print(f'{name:>17}: {before[name] * 1000:9.2f} ms -> {after[name] * 1000:7.3f} ms '
+              f'({before[name] / after[name]:,.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
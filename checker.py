@@ -0,0 +1,210 @@
+"""Streaming output checkers for the judge.
+
+Outputs are compared chunk by chunk straight from the files, so a huge
+output from a buggy solution is never loaded into memory, and only a short
+snippet around the first difference is reported back.
+"""
+from functools import partial
+from itertools import zip_longest
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = b' \t\n\r\x0b\x0c'
+
+# Bytes of context shown on each side of a difference
+SNIPPET_CONTEXT = 40
+
+# Tolerance of the float checker when a problem does not set one
+DEFAULT_EPSILON = 1e-6
+
+
+class ByteStream:
+    """Chunked reader over a binary file with push-back and line counting"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = b''
+        self.line = 1
+
+    def read(self, size=CHUNK_SIZE):
+        if self.buffer:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        else:
+            data = self.f.read(size)
+        self.line += data.count(b'\n')
+        return data
+
+    def unread(self, data):
+        self.line -= data.count(b'\n')
+        self.buffer = data + self.buffer
+
+    def skip_whitespace(self):
+        while True:
+            data = self.read()
+            if not data:
+                return
+            stripped = data.lstrip(WHITESPACE)
+            if stripped:
+                self.unread(stripped)
+                return
+
+    def rest_is_whitespace(self):
+        while True:
+            data = self.read()
+            if not data:
+                return True
+            if data.strip(WHITESPACE):
+                return False
+
+
+def _common_prefix_length(a, b):
+    """Length of the common prefix of two byte strings"""
+    low, high = 0, min(len(a), len(b))
+    # Binary search on slice equality keeps the comparison in C
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _snippet(data, position):
+    """The text around position, widened to whole tokens where short enough"""
+    start = max(0, position - SNIPPET_CONTEXT)
+    end = min(len(data), position + SNIPPET_CONTEXT)
+    for index in range(position - 1, start - 1, -1):
+        if data[index] in WHITESPACE:
+            start = index + 1
+            break
+    for index in range(position, end):
+        if data[index] in WHITESPACE:
+            end = index
+            break
+    text = data[start:end].decode('utf-8', 'replace')
+    if len(text) > 2 * SNIPPET_CONTEXT:
+        text = text[:2 * SNIPPET_CONTEXT] + '...'
+    return text or '<end of output>'
+
+
+def compare_exact(expected_file, actual_file):
+    """Compare two binary files ignoring leading and trailing whitespace.
+
+    Equivalent to expected.strip() == actual.strip(). Returns a tuple
+    (equal, message) where message describes the first difference.
+    """
+    expected = ByteStream(expected_file)
+    actual = ByteStream(actual_file)
+    expected.skip_whitespace()
+    actual.skip_whitespace()
+
+    while True:
+        expected_chunk = expected.read()
+        actual_chunk = actual.read()
+        if expected_chunk == actual_chunk:
+            if not expected_chunk:
+                return True, ''
+            continue
+
+        common = _common_prefix_length(expected_chunk, actual_chunk)
+        expected.unread(expected_chunk[common:])
+        actual.unread(actual_chunk[common:])
+        if expected_chunk and actual_chunk and common in (len(expected_chunk), len(actual_chunk)):
+            # One chunk is a prefix of the other; read on from the same offset
+            continue
+
+        # Past the common prefix only trailing whitespace may differ
+        line = expected.line
+        if expected.rest_is_whitespace() and actual.rest_is_whitespace():
+            return True, ''
+
+        return False, (f'Line {line}: expected {_snippet(expected_chunk, common)!r}, '
+                       f'got {_snippet(actual_chunk, common)!r}')
+
+
+# Longest token shown in a difference report
+TOKEN_DISPLAY_LENGTH = 40
+
+
+def iter_tokens(f):
+    """Yield the whitespace-separated tokens of a binary file, chunk by chunk"""
+    partial = []
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            if partial:
+                yield b''.join(partial)
+            return
+
+        tokens = chunk.split()
+        if not tokens:
+            if partial:
+                yield b''.join(partial)
+                partial = []
+            continue
+
+        # Glue a token split across the chunk boundary back together
+        if partial:
+            if chunk[:1] in WHITESPACE:
+                yield b''.join(partial)
+            else:
+                tokens[0] = b''.join(partial) + tokens[0]
+            partial = []
+
+        if chunk[-1:] not in WHITESPACE:
+            partial.append(tokens.pop())
+        yield from tokens
+
+
+def _display(token):
+    if token is None:
+        return '<end of output>'
+    text = token.decode('utf-8', 'replace')
+    if len(text) > TOKEN_DISPLAY_LENGTH:
+        text = text[:TOKEN_DISPLAY_LENGTH] + '...'
+    return text
+
+
+def _compare_token_streams(expected_file, actual_file, tokens_match):
+    for index, (expected, actual) in enumerate(
+            zip_longest(iter_tokens(expected_file), iter_tokens(actual_file)), start=1):
+        if expected is None or actual is None or not tokens_match(expected, actual):
+            return False, f'Token {index}: expected {_display(expected)!r}, got {_display(actual)!r}'
+    return True, ''
+
+
+def compare_tokens(expected_file, actual_file):
+    """Compare two binary files token by token, ignoring all whitespace"""
+    return _compare_token_streams(expected_file, actual_file, bytes.__eq__)
+
+
+def compare_floats(expected_file, actual_file, epsilon):
+    """Compare tokens, accepting numbers within an absolute or relative epsilon"""
+    def tokens_match(expected, actual):
+        if expected == actual:
+            return True
+        try:
+            expected_value = float(expected)
+            actual_value = float(actual)
+        except ValueError:
+            return False
+        difference = abs(expected_value - actual_value)
+        return difference <= epsilon or difference <= epsilon * abs(expected_value)
+
+    return _compare_token_streams(expected_file, actual_file, tokens_match)
+
+
+# Built-in comparators by Problem.checker; 'custom' problems run their own
+# checker program instead (see judge.run_custom_checker)
+CHECKERS = {
+    'exact': compare_exact,
+    'tokens': compare_tokens,
+    'float': compare_floats,
+}
+
+
+def get_checker(name, epsilon=None):
+    """Comparator for a built-in checker, called with (expected_file, actual_file)"""
+    if name == 'float':
+        return partial(compare_floats, epsilon=DEFAULT_EPSILON if epsilon is None else epsilon)
+    return CHECKERS[name]
@@ -1,7 +1,7 @@
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed
-from wtforms import StringField, TextAreaField, PasswordField, SelectField, IntegerField, DateTimeField, BooleanField, SubmitField
-from wtforms.validators import DataRequired, Email, Length, EqualTo, NumberRange
+from wtforms import StringField, TextAreaField, PasswordField, SelectField, SelectMultipleField, IntegerField, FloatField, DateTimeField, BooleanField, SubmitField
+from wtforms.validators import DataRequired, Email, Length, EqualTo, NumberRange, Optional
 from wtforms.widgets import TextArea
 
 
@@ -33,6 +33,19 @@ class ProblemForm(FlaskForm):
     memory_limit = IntegerField('Memory Limit (MB)', validators=[DataRequired(), NumberRange(min=16, max=1024)], default=256)
     difficulty = SelectField('Difficulty', choices=[('easy', 'Easy'), ('medium', 'Medium'), ('hard', 'Hard')], default='easy')
     points = IntegerField('Points', validators=[DataRequired(), NumberRange(min=1, max=1000)], default=100)
+    judging_policy = SelectField('Judging Policy', choices=[
+        ('ioi', 'IOI (run all tests, partial score)'),
+        ('icpc', 'ICPC (stop at first failure)'),
+        ('subtask', 'Subtasks (stop a group at its first failure)')
+    ], default='ioi')
+    checker = SelectField('Checker', choices=[
+        ('exact', 'Exact match'),
+        ('tokens', 'Tokens (ignore whitespace)'),
+        ('float', 'Floating point tolerance'),
+        ('custom', 'Custom checker program')
+    ], default='exact')
+    checker_epsilon = FloatField('Float Tolerance', validators=[Optional(), NumberRange(min=0)], default=1e-6)
+    checker_source = TextAreaField('Custom Checker (C++)', render_kw={'rows': 10})
     submit = SubmitField('Save Problem')
 
 
@@ -41,6 +54,7 @@ class TestCaseForm(FlaskForm):
     output_data = TextAreaField('Expected Output', validators=[DataRequired()])
     is_sample = BooleanField('Is Sample Test Case')
     points = IntegerField('Points', validators=[DataRequired(), NumberRange(min=1, max=100)], default=10)
+    subtask = IntegerField('Subtask', validators=[Optional(), NumberRange(min=1)])
     submit = SubmitField('Add Test Case')
 
 
@@ -70,6 +84,25 @@ class ContestForm(FlaskForm):
     submit = SubmitField('Save Contest')
 
 
+class FreezeForm(FlaskForm):
+    freeze_time = DateTimeField('Freeze Time', validators=[Optional()], format='%Y-%m-%d %H:%M')
+    submit = SubmitField('Save Freeze Time')
+
+
+class RejudgeForm(FlaskForm):
+    problem_id = SelectField('Problem', coerce=int)
+    contest_id = SelectField('Contest', coerce=int)
+    statuses = SelectMultipleField('Only Submissions With Status', choices=[
+        ('accepted', 'Accepted'),
+        ('wrong_answer', 'Wrong Answer'),
+        ('time_limit', 'Time Limit Exceeded'),
+        ('memory_limit', 'Memory Limit Exceeded'),
+        ('runtime_error', 'Runtime Error'),
+        ('compile_error', 'Compilation Error')
+    ])
+    submit = SubmitField('Start Rejudge')
+
+
 class EditUserForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired(), Length(min=3, max=64)])
     email = StringField('Email', validators=[DataRequired(), Email(), Length(max=120)])
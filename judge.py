@@ -1,11 +1,21 @@
+import atexit
 import os
 import subprocess
-import tempfile
 import threading
-import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import closing
 from datetime import datetime
+from types import SimpleNamespace
 from app import app, db
 from models import Submission, TestCase
+from artifact_cache import ArtifactCache
+from sandbox import run_process, read_tail, ran_out_of_memory, WorkspacePool
+from checker import get_checker
+from storage import get_storage
+from scoreboard import update_scoreboard
+from testdata_cache import TestDataCache
+from zygote import ZygotePool
+from jvm import build_class_data_archive, java_options
 
 
 def judge_submission(submission_id):
@@ -17,55 +27,84 @@ def judge_submission(submission_id):
         
         # Update status to judging
         submission.status = 'judging'
+        submission.judge_message = None
         db.session.commit()
         
         try:
-            # Get test cases
-            test_cases = TestCase.query.filter_by(problem_id=submission.problem_id).all()
+            test_cases = load_test_cases(submission.problem)
             if not test_cases:
                 submission.status = 'accepted'  # No test cases, auto-accept
                 submission.score = submission.problem.points
                 submission.judged_at = datetime.utcnow()
                 db.session.commit()
+                refresh_scoreboard(submission)
                 return
             
-            total_score = 0
+            testdata_cache.prefetch(submission.problem_id, test_cases)
+            
+            policy = submission.problem.judging_policy or 'ioi'
+            verdict = None
+            failed_groups = set()
+            group_points = {}
             max_time = 0
             max_memory = 0
             
-            # Compile if needed
-            if submission.language in ['cpp', 'c', 'java']:
-                compile_result = compile_code(submission)
+            def should_run(test_case):
+                """Skip tests whose result can no longer change the outcome"""
+                if policy == 'icpc':
+                    return verdict is None
+                return scoring_group(test_case, policy) not in failed_groups
+            
+            problem = submission.problem
+            with workspace_pool.workspace() as build_dir, \
+                    workspace_pool.workspace() as checker_dir:
+                # Compile once; every test case runs the same build
+                compile_result = compile_code(submission, build_dir)
                 if not compile_result['success']:
                     submission.status = 'compile_error'
                     submission.judge_message = compile_result['message']
                     submission.judged_at = datetime.utcnow()
                     db.session.commit()
+                    refresh_scoreboard(submission)
                     return
-            
-            # Run against test cases
-            for test_case in test_cases:
-                result = run_test_case(submission, test_case)
                 
-                if result['status'] == 'accepted':
-                    total_score += test_case.points
-                elif result['status'] in ['time_limit', 'memory_limit', 'runtime_error']:
-                    submission.status = result['status']
-                    submission.judge_message = result.get('message', '')
-                    break
-                else:  # wrong_answer
-                    if submission.status != 'wrong_answer':
-                        submission.status = 'wrong_answer'
+                checker = problem.checker or 'exact'
+                if checker == 'custom':
+                    checker_program = SimpleNamespace(language='cpp', code=problem.checker_source or '')
+                    checker_result = compile_code(checker_program, checker_dir)
+                    if not checker_result['success']:
+                        raise RuntimeError(f"Checker compilation failed: {checker_result['message']}")
                 
-                max_time = max(max_time, result.get('time', 0))
-                max_memory = max(max_memory, result.get('memory', 0))
+                multiplier = app.config['JUDGE_TIME_MULTIPLIERS'].get(submission.language, 1.0)
+                job = {
+                    'language': submission.language,
+                    'build_dir': build_dir,
+                    'time_limit': int(problem.time_limit * multiplier),
+                    'memory_limit': problem.memory_limit,
+                    'checker': checker,
+                    'checker_epsilon': problem.checker_epsilon,
+                    'checker_dir': checker_dir,
+                }
+                
+                # Run against test cases
+                with closing(iter_test_results(job, test_cases, should_run)) as results:
+                    for test_case, result in results:
+                        group = scoring_group(test_case, policy)
+                        group_points[group] = group_points.get(group, 0) + test_case.points
+                        
+                        if result['status'] != 'accepted':
+                            failed_groups.add(group)
+                            if verdict is None:
+                                verdict = result['status']
+                                submission.judge_message = result.get('message', '')
+                        
+                        max_time = max(max_time, result.get('time', 0))
+                        max_memory = max(max_memory, result.get('memory', 0))
             
-            # Set final status
-            if submission.status == 'judging':
-                if total_score == sum(tc.points for tc in test_cases):
-                    submission.status = 'accepted'
-                else:
-                    submission.status = 'wrong_answer'
+            # The verdict is the first failure; groups score all or nothing
+            submission.status = verdict or 'accepted'
+            total_score = sum(points for group, points in group_points.items()
+                              if group not in failed_groups)
             
             submission.score = total_score
             submission.execution_time = max_time
@@ -79,186 +118,383 @@ def judge_submission(submission_id):
             submission.judged_at = datetime.utcnow()
         
         db.session.commit()
+        refresh_scoreboard(submission)
 
 
-def compile_code(submission):
-    """Compile code if necessary"""
+def refresh_scoreboard(submission):
+    """Update the scoreboard with a newly judged submission"""
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            if submission.language == 'cpp':
-                source_file = os.path.join(temp_dir, 'solution.cpp')
-                executable = os.path.join(temp_dir, 'solution')
-                
-                with open(source_file, 'w') as f:
-                    f.write(submission.code)
-                
-                result = subprocess.run(
-                    ['g++', '-o', executable, source_file, '-std=c++17'],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                
-                if result.returncode != 0:
-                    return {'success': False, 'message': result.stderr}
-                
-            elif submission.language == 'c':
-                source_file = os.path.join(temp_dir, 'solution.c')
-                executable = os.path.join(temp_dir, 'solution')
-                
-                with open(source_file, 'w') as f:
-                    f.write(submission.code)
-                
-                result = subprocess.run(
-                    ['gcc', '-o', executable, source_file],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                
-                if result.returncode != 0:
-                    return {'success': False, 'message': result.stderr}
-                
-            elif submission.language == 'java':
-                source_file = os.path.join(temp_dir, 'Solution.java')
-                
-                with open(source_file, 'w') as f:
-                    f.write(submission.code)
-                
-                result = subprocess.run(
-                    ['javac', source_file],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                
-                if result.returncode != 0:
-                    return {'success': False, 'message': result.stderr}
+        update_scoreboard(submission.user_id, submission.problem_id)
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error updating scoreboard for submission {submission.id}: {e}")
+
+
+# Source file name, build and run commands and build outputs for each
+# language; commands are formatted with the source path, the build directory
+# and the memory limit in MB
+LANGUAGES = {
+    'python3': {
+        'source': 'solution.py',
+        'compile': None,
+        'run': ['python3', '{source}'],
+        'limit_address_space': True,
+    },
+    'cpp': {
+        'source': 'solution.cpp',
+        'compile': ['g++', '-o', '{build_dir}/solution', '{source}', '-std=c++17'],
+        'artifacts': ['solution'],
+        'run': ['{build_dir}/solution'],
+        'limit_address_space': True,
+    },
+    'c': {
+        'source': 'solution.c',
+        'compile': ['gcc', '-o', '{build_dir}/solution', '{source}'],
+        'artifacts': ['solution'],
+        'run': ['{build_dir}/solution'],
+        'limit_address_space': True,
+    },
+    'java': {
+        'source': 'Solution.java',
+        'compile': ['javac', '{source}'],
+        'artifacts': ['*.class'],
+        'run': ['java', '-Xmx{memory_limit}m', '-cp', '{build_dir}', 'Solution'],
+        'limit_address_space': False,
+    },
+}
+
+
+# Compiled artifacts shared by resubmissions and rejudges of identical code
+artifact_cache = None
+if app.config['JUDGE_ARTIFACT_CACHE_SIZE']:
+    artifact_cache = ArtifactCache(app.config['JUDGE_ARTIFACT_CACHE_DIR'],
+                                   app.config['JUDGE_ARTIFACT_CACHE_SIZE'] * 1024 * 1024)
+
+
+def _format_command(template, build_dir, source_file, memory_limit=None):
+    return [arg.format(build_dir=build_dir, source=source_file, memory_limit=memory_limit)
+            for arg in template]
+
+
+# Reusable working directories for builds and test runs
+workspace_pool = WorkspacePool(app.config['JUDGE_WORKSPACE_ROOT'], app.config['JUDGE_WORKSPACES'])
+atexit.register(workspace_pool.close)
+
+# Warm interpreters forking Python 3 test runs
+zygote_pool = None
+if app.config['JUDGE_PYTHON_ZYGOTE']:
+    zygote_pool = ZygotePool()
+    atexit.register(zygote_pool.close)
+
+# Verified local copies of test data, shared by all judge threads
+testdata_cache = TestDataCache(app.config['JUDGE_TESTDATA_CACHE_DIR'], get_storage())
+
+# Shared by all judge threads so the number of test programs this process
+# runs at once never exceeds JUDGE_PARALLEL_TESTS; like JUDGE_WORKERS, the cap
+# is per judge process, so size it for the number of workers on the host
+test_executor = None
+if app.config['JUDGE_PARALLEL_TESTS']:
+    test_executor = ThreadPoolExecutor(max_workers=app.config['JUDGE_PARALLEL_TESTS'],
+                                       thread_name_prefix='test-runner')
+
+
+# Test case lists per (problem id, test data version), so a rejudge batch
+# queries each problem's tests once
+_test_case_lists = {}
+_test_case_lock = threading.Lock()
+
+
+def load_test_cases(problem):
+    """Test cases of a problem in judging order, as plain records safe to
+    share between judge threads"""
+    key = (problem.id, problem.test_data_version or 0)
+    with _test_case_lock:
+        test_cases = _test_case_lists.get(key)
+    if test_cases is not None:
+        return test_cases
+    
+    test_cases = [
+        SimpleNamespace(id=test_case.id, input_hash=test_case.input_hash,
+                        output_hash=test_case.output_hash, points=test_case.points,
+                        subtask=test_case.subtask)
+        for test_case in TestCase.query.filter_by(problem_id=problem.id).order_by(TestCase.id)
+    ]
+    with _test_case_lock:
+        # Older versions of this problem's tests are never needed again
+        for stale_key in [k for k in _test_case_lists if k[0] == problem.id]:
+            del _test_case_lists[stale_key]
+        _test_case_lists[key] = test_cases
+    return test_cases
+
+
+def scoring_group(test_case, policy):
+    """Key of the group a test is scored with; tests form their own group
+    unless the subtask policy applies"""
+    if policy == 'subtask' and test_case.subtask is not None:
+        return ('subtask', test_case.subtask)
+    return ('test', test_case.id)
+
+
+def iter_test_results(job, test_cases, should_run):
+    """Yield (test_case, result) pairs in test order.
+    
+    should_run is asked about each test, in order, just before its result
+    is needed and lets the caller skip tests that cannot change the outcome.
+    When parallel judging is enabled the test cases are fanned out over
+    test_executor; skipped tests are cancelled if not yet started, and
+    running ones are waited for before the build is cleaned up.
+    """
+    if test_executor is None:
+        for test_case in test_cases:
+            if should_run(test_case):
+                yield test_case, run_test_case(job, test_case)
+        return
+    
+    futures = [test_executor.submit(run_test_case, job, test_case) for test_case in test_cases]
+    try:
+        for test_case, future in zip(test_cases, futures):
+            if should_run(test_case):
+                yield test_case, future.result()
+            else:
+                future.cancel()
+    finally:
+        for future in futures:
+            future.cancel()
+        wait(futures)
+
+
+def compile_code(submission, build_dir):
+    """Write the source into build_dir and compile it if necessary"""
+    try:
+        language = LANGUAGES[submission.language]
+        source_file = os.path.join(build_dir, language['source'])
+        
+        with open(source_file, 'w') as f:
+            f.write(submission.code)
+        
+        if language['compile'] is None:
+            return {'success': True}
+        
+        cache_key = None
+        if artifact_cache is not None:
+            cache_key = ArtifactCache.make_key(submission.language, language['compile'], submission.code)
+            if artifact_cache.fetch(cache_key, build_dir):
+                return {'success': True}
+        
+        result = subprocess.run(
+            _format_command(language['compile'], build_dir, source_file),
+            capture_output=True,
+            text=True,
+            timeout=30
+        )
+        
+        if result.returncode != 0:
+            return {'success': False, 'message': result.stderr}
+        
+        if artifact_cache is not None:
+            artifact_cache.store(cache_key, build_dir, language['artifacts'])
         
         return {'success': True}
         
+    except KeyError:
+        return {'success': False, 'message': f'Unsupported language: {submission.language}'}
     except subprocess.TimeoutExpired:
         return {'success': False, 'message': 'Compilation timeout'}
     except Exception as e:
         return {'success': False, 'message': f'Compilation error: {str(e)}'}
 
 
-def run_test_case(submission, test_case):
-    """Run submission against a single test case"""
+def get_run_command(language, build_dir, memory_limit):
+    """Command that runs a program built by compile_code"""
+    settings = LANGUAGES[language]
+    source_file = os.path.join(build_dir, settings['source'])
+    cmd = _format_command(settings['run'], build_dir, source_file, memory_limit)
+    if language == 'java':
+        cmd[1:1] = java_run_options
+    return cmd
+
+
+def run_program(language, build_dir, memory_limit, stdin_path, stdout_path, stderr_path, **limits):
+    """Run a program built by compile_code with sandbox.run_process limits
+    
+    Python 3 programs are forked from a warm zygote when enabled.
+    """
+    if language == 'python3' and zygote_pool is not None:
+        source_file = os.path.join(build_dir, LANGUAGES[language]['source'])
+        return zygote_pool.run(source_file, stdin_path, stdout_path, stderr_path, **limits)
+    
+    cmd = get_run_command(language, build_dir, memory_limit)
+    return run_process(cmd, stdin_path, stdout_path, stderr_path, **limits)
+
+
+# Extra JVM options for Java runs; see prepare_java_runtime
+java_run_options = java_options(app.config['JUDGE_JAVA_CDS_ARCHIVE'])
+
+
+def prepare_java_runtime():
+    """Build the JVM class-data sharing archive used by Java runs, if missing"""
+    global java_run_options
+    archive = app.config['JUDGE_JAVA_CDS_ARCHIVE']
+    if not os.path.exists(archive):
+        with workspace_pool.workspace() as work_dir:
+            try:
+                build_class_data_archive(archive, work_dir)
+            except (OSError, subprocess.SubprocessError) as e:
+                app.logger.warning(f"Cannot build Java class data archive: {e}")
+    java_run_options = java_options(archive)
+
+
+# CPU seconds a trivial program spends starting up, per language
+startup_overhead = {}
+
+CALIBRATION_PROGRAMS = {
+    'python3': '',
+    'cpp': 'int main() { return 0; }',
+    'c': 'int main(void) { return 0; }',
+    'java': 'public class Solution { public static void main(String[] args) {} }',
+}
+
+
+def calibrate_startup_overhead(runs=5):
+    """Measure the startup CPU time of each language runtime on this host"""
+    for language, code in CALIBRATION_PROGRAMS.items():
+        with workspace_pool.workspace() as build_dir:
+            program = SimpleNamespace(language=language, code=code)
+            compile_result = compile_code(program, build_dir)
+            if not compile_result['success']:
+                app.logger.warning(f"Cannot calibrate {language}: {compile_result['message']}")
+                continue
+            
+            samples = [
+                run_program(language, build_dir, 256, os.devnull, os.devnull, os.devnull,
+                            timeout=30)['cpu_time']
+                for _ in range(runs)
+            ]
+            # The fastest run is the least disturbed by other load
+            startup_overhead[language] = min(samples)
+    
+    app.logger.info(f"Startup overhead (CPU seconds): {startup_overhead}")
+
+
+def run_custom_checker(job, input_file, expected_file, output_file):
+    """Run the problem's checker program on a test's output
+    
+    The checker is called as `checker input expected output` and accepts
+    the output by exiting with status 0; whatever it writes to stderr is
+    reported back.
+    """
+    report_file = os.path.join(os.path.dirname(output_file), 'checker.txt')
+    cmd = get_run_command('cpp', job['checker_dir'], None) + [input_file, expected_file, output_file]
+    run = run_process(cmd, os.devnull, os.devnull, report_file,
+                      timeout=app.config['JUDGE_CHECKER_TIMEOUT'])
+    if run['timed_out']:
+        raise RuntimeError('Checker timed out')
+    
+    message = read_tail(report_file, 1024).decode('utf-8', 'replace')
+    return run['returncode'] == 0, message
+
+
+def run_test_case(job, test_case):
+    """Run a compiled submission against a single test case
+    
+    job holds plain values only (language, build directory, limits and
+    checker settings) so test cases can run outside the judging thread's
+    database session.
+    """
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            input_file = os.path.join(temp_dir, 'input.txt')
+        with workspace_pool.workspace() as temp_dir:
+            # Test data is read straight from the host cache, never copied
+            input_file = testdata_cache.path(test_case.input_hash)
+            expected_file = testdata_cache.path(test_case.output_hash)
             output_file = os.path.join(temp_dir, 'output.txt')
+            stderr_file = os.path.join(temp_dir, 'stderr.txt')
             
-            # Write input
-            with open(input_file, 'w') as f:
-                f.write(test_case.input_data)
+            language = LANGUAGES[job['language']]
             
-            # Prepare execution command
-            if submission.language == 'python3':
-                source_file = os.path.join(temp_dir, 'solution.py')
-                with open(source_file, 'w') as f:
-                    f.write(submission.code)
-                cmd = ['python3', source_file]
-                
-            elif submission.language == 'cpp':
-                source_file = os.path.join(temp_dir, 'solution.cpp')
-                executable = os.path.join(temp_dir, 'solution')
-                
-                with open(source_file, 'w') as f:
-                    f.write(submission.code)
-                
-                # Compile
-                compile_result = subprocess.run(
-                    ['g++', '-o', executable, source_file, '-std=c++17'],
-                    capture_output=True,
-                    timeout=30
-                )
-                if compile_result.returncode != 0:
-                    return {'status': 'compile_error', 'message': compile_result.stderr}
-                
-                cmd = [executable]
-                
-            elif submission.language == 'c':
-                source_file = os.path.join(temp_dir, 'solution.c')
-                executable = os.path.join(temp_dir, 'solution')
-                
-                with open(source_file, 'w') as f:
-                    f.write(submission.code)
-                
-                # Compile
-                compile_result = subprocess.run(
-                    ['gcc', '-o', executable, source_file],
-                    capture_output=True,
-                    timeout=30
-                )
-                if compile_result.returncode != 0:
-                    return {'status': 'compile_error', 'message': compile_result.stderr}
-                
-                cmd = [executable]
-                
-            elif submission.language == 'java':
-                source_file = os.path.join(temp_dir, 'Solution.java')
-                
-                with open(source_file, 'w') as f:
-                    f.write(submission.code)
-                
-                # Compile
-                compile_result = subprocess.run(
-                    ['javac', source_file],
-                    capture_output=True,
-                    timeout=30
-                )
-                if compile_result.returncode != 0:
-                    return {'status': 'compile_error', 'message': compile_result.stderr}
-                
-                cmd = ['java', '-cp', temp_dir, 'Solution']
+            # The JVM reserves far more address space than it uses, so Java
+            # is bounded by its heap size instead, and its RSS may exceed the
+            # heap by JUDGE_MEMORY_SLACK for the JVM's own memory
+            address_space = None
+            rss_limit = job['memory_limit'] * 1024  # KB
+            if language['limit_address_space']:
+                address_space = (job['memory_limit'] + app.config['JUDGE_MEMORY_SLACK']) * 1024 * 1024
+            else:
+                rss_limit += app.config['JUDGE_MEMORY_SLACK'] * 1024
+            
+            # Judge on CPU time net of the runtime's startup cost; the wall
+            # clock cap only catches programs sleeping or blocked on input
+            time_limit = job['time_limit'] / 1000.0  # Convert ms to seconds
+            overhead = startup_overhead.get(job['language'], 0.0)
             
             # Execute with time and memory limits
-            start_time = time.time()
+            run = run_program(
+                job['language'],
+                job['build_dir'],
+                job['memory_limit'],
+                input_file,
+                output_file,
+                stderr_file,
+                timeout=(time_limit + overhead) * app.config['JUDGE_WALL_TIME_FACTOR'],
+                cpu_limit=time_limit + overhead,
+                address_space=address_space,
+                output_limit=app.config['JUDGE_OUTPUT_LIMIT'] * 1024 * 1024
+            )
             
-            try:
-                with open(input_file, 'r') as stdin_file:
-                    with open(output_file, 'w') as stdout_file:
-                        process = subprocess.run(
-                            cmd,
-                            stdin=stdin_file,
-                            stdout=stdout_file,
-                            stderr=subprocess.PIPE,
-                            timeout=submission.problem.time_limit / 1000.0,  # Convert ms to seconds
-                            text=True
-                        )
-                
-                execution_time = int((time.time() - start_time) * 1000)  # Convert to ms
-                
-                if process.returncode != 0:
-                    return {
-                        'status': 'runtime_error',
-                        'message': process.stderr,
-                        'time': execution_time
-                    }
-                
-                # Read output
-                with open(output_file, 'r') as f:
-                    actual_output = f.read().strip()
-                
-                expected_output = test_case.output_data.strip()
-                
-                if actual_output == expected_output:
-                    return {
-                        'status': 'accepted',
-                        'time': execution_time,
-                        'memory': 0  # Memory measurement not implemented
-                    }
-                else:
-                    return {
-                        'status': 'wrong_answer',
-                        'time': execution_time,
-                        'message': f'Expected: {expected_output}\nGot: {actual_output}'
-                    }
-                    
-            except subprocess.TimeoutExpired:
-                return {'status': 'time_limit', 'time': submission.problem.time_limit}
+            cpu_time = max(0.0, run['cpu_time'] - overhead)
+            execution_time = int(cpu_time * 1000)  # Convert to ms
+            memory_used = run['max_rss']
+            
+            if run['timed_out'] or cpu_time > time_limit:
+                return {'status': 'time_limit', 'time': job['time_limit'], 'memory': memory_used}
+            
+            stderr = read_tail(stderr_file)
+            if ran_out_of_memory(run, stderr, rss_limit):
+                return {
+                    'status': 'memory_limit',
+                    'message': f'Memory limit exceeded ({memory_used} KB used)',
+                    'time': execution_time,
+                    'memory': memory_used
+                }
+            
+            # Python ignores SIGXFSZ, so also look at what was written
+            output_limit = app.config['JUDGE_OUTPUT_LIMIT'] * 1024 * 1024
+            if run['output_exceeded'] or os.path.getsize(output_file) >= output_limit:
+                return {
+                    'status': 'runtime_error',
+                    'message': f"Output limit exceeded ({app.config['JUDGE_OUTPUT_LIMIT']} MB)",
+                    'time': execution_time,
+                    'memory': memory_used
+                }
+            
+            if run['returncode'] != 0:
+                return {
+                    'status': 'runtime_error',
+                    'message': stderr.decode('utf-8', 'replace'),
+                    'time': execution_time,
+                    'memory': memory_used
+                }
+            
+            if job['checker'] == 'custom':
+                equal, message = run_custom_checker(job, input_file, expected_file, output_file)
+            else:
+                # Compare without loading either output into memory
+                compare = get_checker(job['checker'], job['checker_epsilon'])
+                with open(expected_file, 'rb') as expected, open(output_file, 'rb') as actual:
+                    equal, message = compare(expected, actual)
+            
+            if equal:
+                return {
+                    'status': 'accepted',
+                    'time': execution_time,
+                    'memory': memory_used
+                }
+            else:
+                return {
+                    'status': 'wrong_answer',
+                    'time': execution_time,
+                    'memory': memory_used,
+                    'message': message
+                }
                 
     except Exception as e:
         app.logger.error(f"Error running test case: {e}")
@@ -0,0 +1,177 @@
+"""Database-backed judge queue.
+
+A submission is queued simply by being stored with status ``pending``. Judge
+workers, possibly on many hosts, claim rows by atomically switching them to
+``judging``, so a row is never judged twice and nothing is lost when a web or
+judge process restarts. On PostgreSQL candidates are locked with
+``SELECT ... FOR UPDATE SKIP LOCKED`` so concurrent workers never contend for
+the same row; other databases fall back to a conditional UPDATE.
+
+A worker heartbeats the submissions it is judging; rows whose worker stopped
+heartbeating are requeued by recover_stale_submissions. With each heartbeat
+it also reports itself and its artifact cache counters in JudgeHost, for the
+admin pages.
+
+Queued submissions are split into priority lanes: live contest submissions
+first, then practice submissions, then rejudges. A lower lane whose oldest
+submission has waited longer than JUDGE_STARVATION_TIMEOUT gets one judge
+of its own, so it keeps moving without slowing the live lane down by more
+than a single worker.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import update, or_, func
+from sqlalchemy.exc import IntegrityError
+from app import app, db
+from models import Submission, JudgeHost
+
+# Queue lanes, served in this order
+PRIORITY_LIVE = 0
+PRIORITY_PRACTICE = 1
+PRIORITY_REJUDGE = 2
+
+# Rows queued by older versions have no lane or queue time
+_priority = func.coalesce(Submission.priority, PRIORITY_PRACTICE)
+_queued_at = func.coalesce(Submission.queued_at, Submission.submitted_at)
+
+
+def submission_priority(problem):
+    """Queue lane of a new submission for the given problem"""
+    contest = problem.contest
+    if contest is not None and contest.is_active and contest.is_running():
+        return PRIORITY_LIVE
+    return PRIORITY_PRACTICE
+
+
+def claim_next_submission(host):
+    """Claim the next pending submission for the given worker host and
+    return its id, or None if the queue is empty.
+
+    Submissions are served by lane, oldest first, but users that already
+    have a submission being judged are skipped while others are waiting,
+    so one contestant spamming submissions cannot monopolise the judges.
+    """
+    submission_id = _claim_starved(host)
+    if submission_id is not None:
+        return submission_id
+
+    busy_users = db.session.query(Submission.user_id).filter(Submission.status == 'judging')
+    pending = db.session.query(Submission.id).filter(Submission.status == 'pending')
+
+    for query in (pending.filter(Submission.user_id.notin_(busy_users)), pending):
+        submission_id = _claim_first(query.order_by(_priority, _queued_at, Submission.id), host)
+        if submission_id is not None:
+            return submission_id
+
+    return None
+
+
+def _claim_starved(host):
+    """Claim the oldest submission of a starving lower lane, if any.
+
+    A lane only counts as starving while none of its submissions is being
+    judged, which limits the lower lanes to one judge while the lanes above
+    them keep every judge busy.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config['JUDGE_STARVATION_TIMEOUT'])
+
+    for priority in (PRIORITY_PRACTICE, PRIORITY_REJUDGE):
+        lane = db.session.query(Submission.id).filter(_priority == priority)
+        if lane.filter(Submission.status == 'judging').first() is not None:
+            continue
+
+        query = lane.filter(Submission.status == 'pending', _queued_at < cutoff)\
+                    .order_by(_queued_at, Submission.id)
+        submission_id = _claim_first(query, host)
+        if submission_id is not None:
+            return submission_id
+
+    return None
+
+
+def _claim_first(query, host):
+    """Claim the first submission of an ordered query of pending ids"""
+    if db.engine.dialect.name == 'postgresql':
+        row = query.with_for_update(skip_locked=True).first()
+        if row is None:
+            db.session.rollback()
+            return None
+        # The row is locked by this transaction until the commit
+        _try_claim(row.id, host)
+        return row.id
+
+    for (submission_id,) in query.limit(10).all():
+        if _try_claim(submission_id, host):
+            return submission_id
+    return None
+
+
+def _try_claim(submission_id, host):
+    """Atomically move a pending submission to judging"""
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(Submission)
+        .where(Submission.id == submission_id, Submission.status == 'pending')
+        .values(status='judging', judging_started_at=now, judge_host=host, heartbeat_at=now)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def heartbeat(host):
+    """Mark the submissions being judged by host as alive"""
+    db.session.execute(
+        update(Submission)
+        .where(Submission.status == 'judging', Submission.judge_host == host)
+        # Not a change live pages need to hear about
+        .values(heartbeat_at=datetime.utcnow(), updated_at=Submission.updated_at)
+    )
+    db.session.commit()
+
+
+def report_host(host, artifact_stats=None):
+    """Record that host is alive, with its artifact cache counters"""
+    judge_host = db.session.get(JudgeHost, host)
+    if judge_host is None:
+        judge_host = JudgeHost(host_id=host)
+        db.session.add(judge_host)
+    judge_host.heartbeat_at = datetime.utcnow()
+    if artifact_stats is not None:
+        judge_host.artifact_hits = artifact_stats['hits']
+        judge_host.artifact_misses = artifact_stats['misses']
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A previous run under the same host id is reporting too; the next
+        # heartbeat updates its row
+        db.session.rollback()
+
+
+def release_submissions(host):
+    """Requeue every submission claimed by host, e.g. when a worker restarts
+    under the same host id after a crash. Returns the number requeued."""
+    result = db.session.execute(
+        update(Submission)
+        .where(Submission.status == 'judging', Submission.judge_host == host)
+        .values(status='pending', judging_started_at=None, judge_host=None, heartbeat_at=None)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def recover_stale_submissions(timeout):
+    """Requeue submissions left in judging by a crashed worker.
+
+    A submission is stale when its worker has not heartbeated it for
+    timeout seconds. Returns the number of submissions that were put back
+    in the queue. They keep their lane and place in it.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout)
+    last_seen = func.coalesce(Submission.heartbeat_at, Submission.judging_started_at)
+    result = db.session.execute(
+        update(Submission)
+        .where(Submission.status == 'judging',
+               or_(last_seen.is_(None), last_seen < cutoff))
+        .values(status='pending', judging_started_at=None, judge_host=None, heartbeat_at=None)
+    )
+    db.session.commit()
+    return result.rowcount
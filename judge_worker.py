@@ -0,0 +1,129 @@
+"""Standalone judge worker.
+
+Drains the pending-submission queue with a fixed-size pool of judge threads.
+Run it as its own process next to the web server, on as many hosts as
+needed; all workers share the queue through the database:
+
+    python judge_worker.py --workers 8
+
+Each worker process identifies itself with a host id (hostname:pid unless
+--host-id is given) and heartbeats the submissions it is judging, so work
+held by a crashed worker is requeued by the others, and reports its
+artifact cache counters, shown on the admin page.
+"""
+import argparse
+import os
+import signal
+import socket
+import threading
+from app import app
+from judge import judge_submission, artifact_cache, calibrate_startup_overhead, prepare_java_runtime
+from judge_queue import claim_next_submission, heartbeat, recover_stale_submissions, release_submissions, \
+    report_host
+
+
+def default_host_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class JudgePool:
+    """Fixed-size pool of threads claiming and judging queued submissions"""
+
+    def __init__(self, size, poll_interval, host_id=None):
+        self.size = size
+        self.poll_interval = poll_interval
+        self.host_id = host_id or default_host_id()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.size):
+            thread = threading.Thread(target=self._work, name=f'judge-{i}')
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+        thread = threading.Thread(target=self._heartbeat, name='judge-heartbeat')
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Stop claiming new work and wait for running judgements to finish"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self):
+        while not self._stop.is_set():
+            submission_id = None
+            try:
+                with app.app_context():
+                    submission_id = claim_next_submission(self.host_id)
+            except Exception as e:
+                app.logger.error(f"Error claiming submission: {e}")
+
+            if submission_id is None:
+                self._stop.wait(self.poll_interval)
+                continue
+
+            judge_submission(submission_id)
+
+    def _heartbeat(self):
+        while not self._stop.wait(app.config['JUDGE_HEARTBEAT_INTERVAL']):
+            try:
+                with app.app_context():
+                    heartbeat(self.host_id)
+                    report_host(self.host_id, artifact_cache.stats() if artifact_cache is not None else None)
+            except Exception as e:
+                app.logger.error(f"Error sending judge heartbeat: {e}")
+
+
+def recover_stale():
+    with app.app_context():
+        recovered = recover_stale_submissions(app.config['JUDGE_STALE_TIMEOUT'])
+    if recovered:
+        app.logger.warning(f"Requeued {recovered} submissions stuck in judging")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a pool of judge workers')
+    parser.add_argument('--workers', type=int, default=app.config['JUDGE_WORKERS'],
+                        help='number of submissions judged concurrently')
+    parser.add_argument('--poll-interval', type=float, default=app.config['JUDGE_POLL_INTERVAL'],
+                        help='seconds to wait when the queue is empty')
+    parser.add_argument('--host-id', default=app.config['JUDGE_HOST_ID'] or default_host_id(),
+                        help='unique name of this worker process (default: hostname:pid)')
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+
+    # Work held by an earlier run under the same host id was abandoned
+    with app.app_context():
+        released = release_submissions(args.host_id)
+    if released:
+        app.logger.warning(f"Requeued {released} submissions left by a previous run of {args.host_id}")
+
+    recover_stale()
+    prepare_java_runtime()
+    calibrate_startup_overhead()
+    pool = JudgePool(args.workers, args.poll_interval, args.host_id)
+    pool.start()
+    app.logger.info(f"Judge worker {args.host_id} started with {args.workers} workers")
+
+    # Periodically requeue work abandoned by crashed workers on any host
+    checks = 0
+    while not stop.wait(app.config['JUDGE_HEARTBEAT_INTERVAL']):
+        recover_stale()
+        checks += 1
+        if artifact_cache is not None and checks % 30 == 0:
+            app.logger.info(f"Artifact cache: {artifact_cache.stats()}")
+
+    app.logger.info("Shutting down judge worker")
+    pool.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,11 @@
+import os
 from app import app
 
 if __name__ == '__main__':
+    # Judge in-process for local development; production runs judge_worker.py
+    if os.environ.get('JUDGE_EMBEDDED'):
+        from judge_worker import JudgePool
+        JudgePool(app.config['JUDGE_WORKERS'], app.config['JUDGE_POLL_INTERVAL'],
+                  app.config['JUDGE_HOST_ID']).start()
+
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,129 @@
+"""Lightweight schema upgrades for databases created by older versions.
+
+``db.create_all()`` only creates missing tables, so columns and indexes added
+to existing models afterwards are added here, and data that moved out of the
+database is migrated on startup. Slow one-off rebuilds are CLI commands, e.g.
+
+    flask --app app rebuild-scoreboard
+"""
+import click
+from sqlalchemy import insert, inspect, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import undefer
+from app import app, db
+
+
+def upgrade_schema():
+    """Add model columns and indexes that are missing from existing tables"""
+    inspector = inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+
+            app.logger.info(f"Adding column {table.name}.{column.name}")
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            try:
+                db.session.execute(text(
+                    f'ALTER TABLE {preparer.quote(table.name)} '
+                    f'ADD COLUMN {preparer.quote(column.name)} {column_type}'
+                ))
+                db.session.commit()
+            except DBAPIError:
+                # Web and judge processes starting together race to add
+                # it; losing that race is fine
+                db.session.rollback()
+                if not _has_column(table.name, column.name):
+                    raise
+
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                app.logger.info(f"Creating index {index.name}")
+                try:
+                    index.create(bind=db.engine, checkfirst=True)
+                except DBAPIError:
+                    # Lost the same race as for columns
+                    if not _has_index(table.name, index.name):
+                        raise
+
+
+def _has_column(table_name, column_name):
+    return any(column['name'] == column_name for column in inspect(db.engine).get_columns(table_name))
+
+
+def _has_index(table_name, index_name):
+    return any(index['name'] == index_name for index in inspect(db.engine).get_indexes(table_name))
+
+
+def migrate_test_data(batch_size=100):
+    """Move test data stored inline in the database to test data storage.
+
+    Test cases are moved batch_size at a time, committing and releasing each
+    batch, so large inline test data is never all in memory at once.
+    """
+    from models import TestCase
+    from storage import get_storage
+
+    storage = None
+    moved = 0
+    while True:
+        # Moved test cases get a hash, so each query returns the next batch
+        batch = TestCase.query.filter(TestCase.input_hash.is_(None))\
+                              .options(undefer(TestCase.input_data), undefer(TestCase.output_data))\
+                              .order_by(TestCase.id)\
+                              .limit(batch_size)\
+                              .all()
+        if not batch:
+            break
+
+        storage = storage or get_storage()
+        for test_case in batch:
+            test_case.input_hash, test_case.input_size = storage.put((test_case.input_data or '').encode('utf-8'))
+            test_case.output_hash, test_case.output_size = storage.put((test_case.output_data or '').encode('utf-8'))
+            test_case.input_data = ''
+            test_case.output_data = ''
+
+        db.session.commit()
+        db.session.expunge_all()
+        moved += len(batch)
+
+    if moved:
+        app.logger.info(f"Moved {moved} test cases to test data storage")
+
+
+def migrate_rejudge_batches():
+    """Record the members of rejudge batches started before they were kept"""
+    from models import RejudgeBatch, RejudgeBatchMember, Submission
+
+    if RejudgeBatchMember.query.first() is not None or RejudgeBatch.query.first() is None:
+        return
+
+    # Older batches only know the submissions still tagged with them
+    members = db.session.query(Submission.rejudge_batch_id, Submission.id)\
+                        .filter(Submission.rejudge_batch_id.isnot(None))
+    db.session.execute(insert(RejudgeBatchMember).from_select(['batch_id', 'submission_id'], members))
+    db.session.commit()
+
+
+def check_scoreboard():
+    """Warn when the database predates the materialized scoreboard"""
+    from models import Submission, ScoreboardTotal
+
+    if ScoreboardTotal.query.first() is None and Submission.query.first() is not None:
+        app.logger.warning("The scoreboard is empty; build it with `flask --app app rebuild-scoreboard`")
+
+
+@app.cli.command('rebuild-scoreboard')
+def rebuild_scoreboard_command():
+    """Rebuild the materialized scoreboard from all submissions."""
+    from scoreboard import rebuild_scoreboard
+
+    pairs = rebuild_scoreboard()
+    click.echo(f"Built scoreboard entries for {pairs} user/problem pairs")
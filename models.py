@@ -1,7 +1,7 @@
 from datetime import datetime
 from app import db
 from flask_login import UserMixin
-from sqlalchemy import func
+from sqlalchemy import func, or_
 
 
 class User(UserMixin, db.Model):
@@ -39,6 +39,10 @@ class Contest(db.Model):
     end_time = db.Column(db.DateTime, nullable=False)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    freeze_time = db.Column(db.DateTime)  # public scoreboard stops changing from here
+    unfrozen = db.Column(db.Boolean, default=False)  # set once results are revealed
+    frozen_board = db.deferred(db.Column(db.Text))  # JSON snapshot of the board at freeze_time
+    board_version = db.Column(db.Integer, default=0)  # bumped when the contest's scoreboard changes
     
     # Relationships
     problems = db.relationship('Problem', backref='contest', lazy=True, cascade='all, delete-orphan')
@@ -55,6 +59,12 @@ class Contest(db.Model):
     
     def has_ended(self):
         return datetime.utcnow() > self.end_time
+    
+    def freeze_started(self):
+        return self.freeze_time is not None and datetime.utcnow() >= self.freeze_time
+    
+    def is_frozen(self):
+        return self.freeze_started() and not self.unfrozen
 
 
 class Problem(db.Model):
@@ -71,6 +81,11 @@ class Problem(db.Model):
     memory_limit = db.Column(db.Integer, default=256)  # MB
     difficulty = db.Column(db.String(20), default='easy')
     points = db.Column(db.Integer, default=100)
+    judging_policy = db.Column(db.String(20), default='ioi')  # ioi, icpc, subtask
+    checker = db.Column(db.String(20), default='exact')  # exact, tokens, float, custom
+    checker_epsilon = db.Column(db.Float, default=1e-6)  # absolute/relative tolerance for the float checker
+    checker_source = db.Column(db.Text)  # C++ source of the custom checker
+    test_data_version = db.Column(db.Integer, default=0)  # bumped whenever test cases change
     contest_id = db.Column(db.Integer, db.ForeignKey('contest.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
@@ -86,16 +101,44 @@ class Problem(db.Model):
 class TestCase(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     problem_id = db.Column(db.Integer, db.ForeignKey('problem.id'), nullable=False)
-    input_data = db.Column(db.Text, nullable=False)
-    output_data = db.Column(db.Text, nullable=False)
+    input_hash = db.Column(db.String(64))  # SHA-256 of the input file in test data storage
+    input_size = db.Column(db.Integer)  # bytes
+    output_hash = db.Column(db.String(64))
+    output_size = db.Column(db.Integer)
+    # Legacy inline test data, moved to test data storage by migrations.migrate_test_data
+    input_data = db.deferred(db.Column(db.Text, default=''))
+    output_data = db.deferred(db.Column(db.Text, default=''))
     is_sample = db.Column(db.Boolean, default=False)
     points = db.Column(db.Integer, default=10)
+    subtask = db.Column(db.Integer)  # None for standalone tests
     
     def __repr__(self):
         return f'<TestCase {self.id} for Problem {self.problem_id}>'
 
 
+# Bootstrap colour of each submission status
+STATUS_CLASSES = {
+    'pending': 'warning',
+    'judging': 'info',
+    'accepted': 'success',
+    'wrong_answer': 'danger',
+    'time_limit': 'warning',
+    'memory_limit': 'warning',
+    'runtime_error': 'danger',
+    'compile_error': 'danger'
+}
+
+
 class Submission(db.Model):
+    __table_args__ = (
+        db.Index('ix_submission_user_submitted', 'user_id', 'submitted_at'),
+        db.Index('ix_submission_problem_status', 'problem_id', 'status'),
+        db.Index('ix_submission_user_problem_status', 'user_id', 'problem_id', 'status'),
+        db.Index('ix_submission_status', 'status'),
+        db.Index('ix_submission_submitted', 'submitted_at'),  # admin submission list
+        db.Index('ix_submission_problem_submitted', 'problem_id', 'submitted_at'),  # contest scoreboards
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     problem_id = db.Column(db.Integer, db.ForeignKey('problem.id'), nullable=False)
@@ -108,22 +151,123 @@ class Submission(db.Model):
     judge_message = db.Column(db.Text)
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
     judged_at = db.Column(db.DateTime)
+    judging_started_at = db.Column(db.DateTime)  # set when a judge worker claims the submission
+    judge_host = db.Column(db.String(100))  # judge worker process that claimed the submission
+    heartbeat_at = db.Column(db.DateTime)  # last sign of life from that worker
+    rejudge_batch_id = db.Column(db.Integer, db.ForeignKey('rejudge_batch.id'), nullable=True)
+    previous_status = db.Column(db.String(20))  # verdict before the last rejudge, counted on the scoreboard until it lands
+    previous_score = db.Column(db.Integer)
+    priority = db.Column(db.Integer, default=1)  # judge queue lane: 0 live contest, 1 practice, 2 rejudge
+    queued_at = db.Column(db.DateTime, default=datetime.utcnow)  # when the submission (re)entered the queue
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     def __repr__(self):
         return f'<Submission {self.id} by {self.user.username} for {self.problem.code}>'
     
     def get_status_class(self):
-        status_classes = {
-            'pending': 'warning',
-            'judging': 'info',
-            'accepted': 'success',
-            'wrong_answer': 'danger',
-            'time_limit': 'warning',
-            'memory_limit': 'warning',
-            'runtime_error': 'danger',
-            'compile_error': 'danger'
-        }
-        return status_classes.get(self.status, 'secondary')
+        return STATUS_CLASSES.get(self.status, 'secondary')
+
+
+class RejudgeBatch(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    problem_id = db.Column(db.Integer, db.ForeignKey('problem.id'), nullable=True)
+    contest_id = db.Column(db.Integer, db.ForeignKey('contest.id'), nullable=True)
+    statuses = db.Column(db.String(200))  # comma separated verdict filter, empty for all
+    total = db.Column(db.Integer, default=0)
+    
+    # Relationships
+    submissions = db.relationship('Submission', backref='rejudge_batch', lazy='dynamic')
+    author = db.relationship('User')
+    problem = db.relationship('Problem')
+    contest = db.relationship('Contest')
+    
+    def __repr__(self):
+        return f'<RejudgeBatch {self.id}>'
+    
+    def progress(self):
+        """Number of submissions of the batch judged so far"""
+        # A later batch only takes judged submissions, so members it took
+        # over were already judged for this one
+        return db.session.query(RejudgeBatchMember)\
+                         .join(Submission, Submission.id == RejudgeBatchMember.submission_id)\
+                         .filter(RejudgeBatchMember.batch_id == self.id,
+                                 or_(Submission.status.notin_(['pending', 'judging']),
+                                     Submission.rejudge_batch_id != self.id))\
+                         .count()
+
+
+class RejudgeBatchMember(db.Model):
+    """A submission requeued by a rejudge batch; Submission.rejudge_batch_id
+    only keeps the latest batch"""
+    batch_id = db.Column(db.Integer, db.ForeignKey('rejudge_batch.id'), primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), primary_key=True, index=True)
+    
+    def __repr__(self):
+        return f'<RejudgeBatchMember batch {self.batch_id} submission {self.submission_id}>'
+
+
+# Materialized scoreboard, kept up to date by the judge (see scoreboard.py)
+class ScoreboardEntry(db.Model):
+    __table_args__ = (db.UniqueConstraint('user_id', 'problem_id'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    problem_id = db.Column(db.Integer, db.ForeignKey('problem.id'), nullable=False)
+    contest_id = db.Column(db.Integer, db.ForeignKey('contest.id'), nullable=True, index=True)
+    best_score = db.Column(db.Integer, default=0)
+    submissions = db.Column(db.Integer, default=0)  # judged submissions
+    solved = db.Column(db.Boolean, default=False)
+    wrong_attempts = db.Column(db.Integer, default=0)  # rejected submissions before the first accepted one
+    penalty = db.Column(db.Integer, default=0)  # minutes
+    first_accepted_at = db.Column(db.DateTime)
+    last_accepted_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ScoreboardEntry user {self.user_id} problem {self.problem_id}>'
+
+
+class ScoreboardTotal(db.Model):
+    __table_args__ = (db.Index('ix_scoreboard_total_rank', 'score', 'penalty'),)
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    score = db.Column(db.Integer, default=0)
+    solved = db.Column(db.Integer, default=0)
+    penalty = db.Column(db.Integer, default=0)
+    submissions = db.Column(db.Integer, default=0)
+    last_accepted_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, default=0, index=True)  # BoardState version of the last change
+    
+    user = db.relationship('User')
+    
+    def __repr__(self):
+        return f'<ScoreboardTotal user {self.user_id}>'
+
+
+class BoardState(db.Model):
+    id = db.Column(db.Integer, primary_key=True)  # single row
+    version = db.Column(db.Integer, nullable=False, default=0)  # bumped on every scoreboard change
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<BoardState version {self.version}>'
+
+
+class JudgeHost(db.Model):
+    host_id = db.Column(db.String(100), primary_key=True)  # judge worker process, as in Submission.judge_host
+    heartbeat_at = db.Column(db.DateTime, default=datetime.utcnow)
+    artifact_hits = db.Column(db.Integer, default=0)  # compiled artifact cache counters since the worker started
+    artifact_misses = db.Column(db.Integer, default=0)
+    
+    def __repr__(self):
+        return f'<JudgeHost {self.host_id}>'
+    
+    def artifact_hit_rate(self):
+        lookups = (self.artifact_hits or 0) + (self.artifact_misses or 0)
+        return (self.artifact_hits or 0) / lookups if lookups else None
 
 
 class Announcement(db.Model):
@@ -0,0 +1,111 @@
+"""Live submission status notifications.
+
+Judge workers run in other processes, so status changes are picked up from
+the database: one poller thread per web process reads the submissions whose
+updated_at moved since its last poll and hands them to the subscribers
+interested in them. However many pages are open, the database only sees one
+small indexed query per poll interval.
+"""
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from app import app, db
+from models import Submission, STATUS_CLASSES
+
+# Events a slow subscriber may fall behind by before new ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def submission_event(submission):
+    """The status fields of a submission pushed to live pages"""
+    return {
+        'id': submission.id,
+        'user_id': submission.user_id,
+        'status': submission.status,
+        'status_label': submission.status.replace('_', ' ').title(),
+        'status_class': STATUS_CLASSES.get(submission.status, 'secondary'),
+        'score': submission.score,
+        'execution_time': submission.execution_time,
+        'memory_used': submission.memory_used,
+    }
+
+
+class SubmissionNotifier:
+    """Fans out submission status changes to per-user subscriber queues.
+
+    Rows are read again for lookback seconds after their updated_at, so a
+    change committed late by a slow transaction is still delivered; each
+    (submission, updated_at) pair is delivered once.
+    """
+
+    def __init__(self, poll_interval, lookback=5.0):
+        self.poll_interval = poll_interval
+        self.lookback = timedelta(seconds=lookback)
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._cursor = None
+        self._seen = {}
+
+    def subscribe(self, user_id=None):
+        """Queue receiving the events of a user's submissions, or of all
+        submissions when user_id is None"""
+        events = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[events] = user_id
+            if self._thread is None:
+                self._cursor = datetime.utcnow()
+                self._thread = threading.Thread(target=self._run, name='submission-notifier')
+                self._thread.daemon = True
+                self._thread.start()
+        return events
+
+    def unsubscribe(self, events):
+        with self._lock:
+            self._subscribers.pop(events, None)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for events, user_id in subscribers:
+            if user_id is None or user_id == event['user_id']:
+                try:
+                    events.put_nowait(event)
+                except queue.Full:
+                    pass
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._subscribers:
+                    continue
+            try:
+                with app.app_context():
+                    self.poll()
+            except Exception as e:
+                app.logger.error(f"Error polling submission updates: {e}")
+
+    def poll(self):
+        """Publish the submissions changed since the last poll"""
+        since = self._cursor - self.lookback
+        changed = db.session.query(Submission.id, Submission.user_id, Submission.status,
+                                   Submission.score, Submission.execution_time,
+                                   Submission.memory_used, Submission.updated_at)\
+                            .filter(Submission.updated_at > since)\
+                            .order_by(Submission.updated_at).all()
+
+        for submission in changed:
+            key = (submission.id, submission.updated_at)
+            if key in self._seen:
+                continue
+            self._seen[key] = submission.updated_at
+            self._cursor = max(self._cursor, submission.updated_at)
+            self.publish(submission_event(submission))
+
+        since = self._cursor - self.lookback
+        self._seen = {key: updated_at for key, updated_at in self._seen.items() if updated_at > since}
+
+
+notifier = SubmissionNotifier(app.config['NOTIFIER_POLL_INTERVAL'])
@@ -0,0 +1,59 @@
+"""Batch rejudging of submissions.
+
+A rejudge puts every matching submission back in the judge queue, tagged
+with a RejudgeBatch so its progress can be followed. The batch's members
+are also recorded separately, as a later batch retags the submissions it
+takes. The verdict a submission had is kept as its previous one, which the
+scoreboard counts until it is judged again. Rejudged submissions go to the
+lowest priority lane of the queue (see judge_queue), and the judge reuses
+cached test case lists and compiled artifacts across the batch.
+"""
+from datetime import datetime
+from sqlalchemy import insert, update
+from app import db
+from models import Submission, Problem, RejudgeBatch, RejudgeBatchMember
+from judge_queue import PRIORITY_REJUDGE
+
+# Submissions are requeued in chunks to keep statements small
+REQUEUE_CHUNK_SIZE = 500
+
+
+def start_rejudge(user_id, problem_id=None, contest_id=None, statuses=None):
+    """Requeue the judged submissions matching the filters and return the batch"""
+    query = db.session.query(Submission.id).filter(Submission.status.notin_(['pending', 'judging']))
+    if problem_id:
+        query = query.filter(Submission.problem_id == problem_id)
+    if contest_id:
+        query = query.join(Problem).filter(Problem.contest_id == contest_id)
+    if statuses:
+        query = query.filter(Submission.status.in_(statuses))
+    submission_ids = [submission_id for (submission_id,) in query.order_by(Submission.id).all()]
+
+    batch = RejudgeBatch(
+        created_by=user_id,
+        problem_id=problem_id or None,
+        contest_id=contest_id or None,
+        statuses=','.join(statuses or []),
+        total=len(submission_ids)
+    )
+    db.session.add(batch)
+    db.session.flush()
+
+    queued_at = datetime.utcnow()
+
+    for start in range(0, len(submission_ids), REQUEUE_CHUNK_SIZE):
+        chunk = submission_ids[start:start + REQUEUE_CHUNK_SIZE]
+        db.session.execute(
+            update(Submission)
+            .where(Submission.id.in_(chunk))
+            .values(status='pending', previous_status=Submission.status,
+                    previous_score=Submission.score, rejudge_batch_id=batch.id,
+                    judging_started_at=None, priority=PRIORITY_REJUDGE, queued_at=queued_at)
+        )
+        db.session.execute(
+            insert(RejudgeBatchMember),
+            [{'batch_id': batch.id, 'submission_id': submission_id} for submission_id in chunk]
+        )
+
+    db.session.commit()
+    return batch
@@ -1,15 +1,21 @@
 import os
-from datetime import datetime
-from flask import render_template, request, redirect, url_for, flash, jsonify, abort, send_from_directory
+import json
+import queue
+import time
+from datetime import datetime, timedelta, timezone
+from flask import render_template, request, redirect, url_for, flash, jsonify, abort, send_from_directory, send_file, make_response, Response
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-from sqlalchemy import desc, func
+from sqlalchemy import desc
 from app import app, db
-from models import User, Problem, TestCase, Submission, Contest, Announcement
+from models import User, Problem, TestCase, Submission, Contest, Announcement, RejudgeBatch, JudgeHost
 from forms import *
-from judge import judge_submission
-import threading
+from storage import get_storage
+from rejudge import start_rejudge
+from judge_queue import submission_priority
+from notifier import notifier, submission_event
+from scoreboard import scoreboard_cache, touch_user, touch_contest, resolve_events
 
 
 @app.route('/')
@@ -183,17 +189,14 @@ def submit_solution(problem_id):
             problem_id=problem_id,
             language=form.language.data,
             code=form.code.data,
-            status='pending'
+            status='pending',
+            priority=submission_priority(problem)
         )
         
+        # Queued for the judge workers (see judge_worker.py)
         db.session.add(submission)
         db.session.commit()
         
-        # Start judging in background
-        thread = threading.Thread(target=judge_submission, args=(submission.id,))
-        thread.daemon = True
-        thread.start()
-        
         flash('Solution submitted! Check the submissions page for results.', 'success')
         return redirect(url_for('submissions'))
     
@@ -214,28 +217,43 @@ def submissions():
 
 @app.route('/scoreboard')
 def scoreboard():
-    """Show contest scoreboard"""
-    # Calculate scores per user
-    query = db.session.query(
-        User.id,
-        User.username,
-        User.full_name,
-        func.count(Submission.id.distinct()).label('total_submissions'),
-        func.count(
-            db.case((Submission.status == 'accepted', 1), else_=None)
-        ).label('solved_problems'),
-        func.sum(
-            db.case((Submission.status == 'accepted', Problem.points), else_=0)
-        ).label('total_score')
-    ).join(Submission, User.id == Submission.user_id, isouter=True)\
-     .join(Problem, Submission.problem_id == Problem.id, isouter=True)\
-     .filter(User.role.in_(['contestant', 'admin', 'judge']))\
-     .group_by(User.id, User.username, User.full_name)\
-     .order_by(desc('total_score'), 'total_submissions')
-    
-    scoreboard_data = query.all()
-    
-    return render_template('scoreboard.html', scoreboard=scoreboard_data)
+    """Show the overall scoreboard, or a contest's with ?contest=<id>"""
+    contest, snapshot = _scoreboard_snapshot()
+    
+    # The page shows who is logged in, so each user gets their own tag
+    viewer = current_user.id if current_user.is_authenticated else 'anonymous'
+    etag = f'{snapshot.etag}-{viewer}'
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+    
+    contests = Contest.query.order_by(desc(Contest.start_time)).all()
+    response = make_response(render_template('scoreboard.html', scoreboard=snapshot.rows,
+                                             version=snapshot.version, contest=contest,
+                                             contests=contests, problems=snapshot.problems,
+                                             frozen=snapshot.frozen))
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+def _scoreboard_snapshot():
+    """The contest named by the contest query argument, if any, and the
+    cached snapshot of its scoreboard"""
+    # Judges keep seeing live results while boards are frozen for everyone else
+    judge = current_user.is_authenticated and current_user.is_judge()
+    contest_id = request.args.get('contest', type=int)
+    if contest_id is None:
+        return None, scoreboard_cache.get(frozen=not judge)
+    
+    contest = Contest.query.get_or_404(contest_id)
+    return contest, scoreboard_cache.get(contest.id, frozen=contest.is_frozen() and not judge)
+
+
+def _not_modified(etag):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
 
 
 @app.route('/profile')
@@ -272,11 +290,17 @@ def admin():
     total_submissions = Submission.query.count()
     pending_submissions = Submission.query.filter_by(status='pending').count()
     
+    # Judge workers heard from recently, with their artifact cache counters
+    alive_since = datetime.utcnow() - timedelta(seconds=app.config['JUDGE_STALE_TIMEOUT'])
+    judge_hosts = JudgeHost.query.filter(JudgeHost.heartbeat_at >= alive_since)\
+                                 .order_by(JudgeHost.host_id).all()
+    
     return render_template('admin.html',
                          total_users=total_users,
                          total_problems=total_problems,
                          total_submissions=total_submissions,
-                         pending_submissions=pending_submissions)
+                         pending_submissions=pending_submissions,
+                         judge_hosts=judge_hosts)
 
 
 @app.route('/admin/problems')
@@ -319,7 +343,11 @@ def create_problem():
             time_limit=form.time_limit.data,
             memory_limit=form.memory_limit.data,
             difficulty=form.difficulty.data,
-            points=form.points.data
+            points=form.points.data,
+            judging_policy=form.judging_policy.data,
+            checker=form.checker.data,
+            checker_epsilon=form.checker_epsilon.data,
+            checker_source=form.checker_source.data
         )
         
         db.session.add(problem)
@@ -384,15 +412,23 @@ def add_test_case(problem_id):
     form = TestCaseForm()
     
     if form.validate_on_submit():
+        storage = get_storage()
+        input_hash, input_size = storage.put(form.input_data.data.encode('utf-8'))
+        output_hash, output_size = storage.put(form.output_data.data.encode('utf-8'))
+        
         test_case = TestCase(
             problem_id=problem_id,
-            input_data=form.input_data.data,
-            output_data=form.output_data.data,
+            input_hash=input_hash,
+            input_size=input_size,
+            output_hash=output_hash,
+            output_size=output_size,
             is_sample=form.is_sample.data,
-            points=form.points.data
+            points=form.points.data,
+            subtask=form.subtask.data
         )
         
         db.session.add(test_case)
+        problem.test_data_version = (problem.test_data_version or 0) + 1
         db.session.commit()
         
         flash('Test case added successfully!', 'success')
@@ -401,6 +437,18 @@ def add_test_case(problem_id):
     return render_template('add_test_case.html', form=form, problem=problem)
 
 
+@app.route('/admin/test-case/<int:test_case_id>/<any(input, output):kind>')
+@login_required
+def test_case_data(test_case_id, kind):
+    """Show the input or expected output of a test case"""
+    if not current_user.is_judge():
+        abort(403)
+    
+    test_case = TestCase.query.get_or_404(test_case_id)
+    digest = test_case.input_hash if kind == 'input' else test_case.output_hash
+    return send_file(get_storage().open(digest), mimetype='text/plain')
+
+
 @app.route('/admin/submissions')
 @login_required
 def admin_submissions():
@@ -416,6 +464,111 @@ def admin_submissions():
     return render_template('submissions.html', submissions=all_submissions, admin_view=True)
 
 
+@app.route('/admin/rejudge', methods=['GET', 'POST'])
+@login_required
+def admin_rejudge():
+    """Rejudge the submissions of a problem or contest"""
+    if not current_user.is_judge():
+        flash('Access denied. Judge privileges required.', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    form = RejudgeForm()
+    form.problem_id.choices = [(0, 'All problems')] + \
+        [(p.id, f'{p.code} - {p.title}') for p in Problem.query.order_by(Problem.code).all()]
+    form.contest_id.choices = [(0, 'All contests')] + \
+        [(c.id, c.name) for c in Contest.query.order_by(desc(Contest.start_time)).all()]
+    
+    if form.validate_on_submit():
+        if not form.problem_id.data and not form.contest_id.data:
+            flash('Choose a problem or a contest to rejudge.', 'warning')
+        else:
+            batch = start_rejudge(current_user.id,
+                                  problem_id=form.problem_id.data,
+                                  contest_id=form.contest_id.data,
+                                  statuses=form.statuses.data)
+            flash(f'Rejudging {batch.total} submissions.', 'success')
+            return redirect(url_for('admin_rejudge'))
+    
+    batches = RejudgeBatch.query.order_by(desc(RejudgeBatch.created_at)).limit(20).all()
+    return render_template('rejudge.html', form=form, batches=batches)
+
+
+@app.route('/admin/contest/<int:contest_id>/freeze', methods=['GET', 'POST'])
+@login_required
+def contest_freeze(contest_id):
+    """Set when a contest's public scoreboard freezes"""
+    if not current_user.is_judge():
+        flash('Access denied. Judge privileges required.', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    contest = Contest.query.get_or_404(contest_id)
+    form = FreezeForm(obj=contest)
+    
+    if form.validate_on_submit():
+        contest.freeze_time = form.freeze_time.data
+        contest.unfrozen = False
+        contest.frozen_board = None  # recomputed on first use
+        touch_contest(contest.id)
+        db.session.commit()
+        
+        flash('Freeze time saved.', 'success')
+        return redirect(url_for('contest_freeze', contest_id=contest_id))
+    
+    return render_template('freeze.html', form=form, contest=contest)
+
+
+@app.route('/admin/contest/<int:contest_id>/unfreeze', methods=['POST'])
+@login_required
+def contest_unfreeze(contest_id):
+    """Show a contest's live scoreboard to everyone"""
+    if not current_user.is_judge():
+        abort(403)
+    
+    contest = Contest.query.get_or_404(contest_id)
+    contest.unfrozen = True
+    touch_contest(contest.id)
+    db.session.commit()
+    
+    flash('Scoreboard unfrozen.', 'success')
+    return redirect(url_for('contest_freeze', contest_id=contest_id))
+
+
+@app.route('/admin/contest/<int:contest_id>/resolver')
+@login_required
+def contest_resolver(contest_id):
+    """Reveal a frozen scoreboard one result at a time"""
+    if not current_user.is_judge():
+        flash('Access denied. Judge privileges required.', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    contest = Contest.query.get_or_404(contest_id)
+    # The frozen board is stored on first use, so it must not be built early
+    if not contest.freeze_started():
+        flash('The scoreboard of this contest has not frozen yet.', 'warning')
+        return redirect(url_for('contest_freeze', contest_id=contest_id))
+    
+    snapshot = scoreboard_cache.get(contest.id, frozen=True)
+    return render_template('resolver.html', contest=contest, scoreboard=snapshot.rows,
+                           problems=snapshot.problems)
+
+
+@app.route('/api/contest/<int:contest_id>/resolve')
+@login_required
+def get_resolve_events(contest_id):
+    """Stream the reveals turning the frozen scoreboard into the live one (AJAX)"""
+    if not current_user.is_judge():
+        abort(403)
+    
+    contest = Contest.query.get_or_404(contest_id)
+    if not contest.freeze_started():
+        abort(404)
+    
+    frozen = scoreboard_cache.get(contest.id, frozen=True)
+    live = scoreboard_cache.get(contest.id)
+    events = resolve_events(frozen.rows, live.rows)
+    return Response((json.dumps(event) + '\n' for event in events), mimetype='application/x-ndjson')
+
+
 @app.route('/admin/users')
 @login_required
 def admin_users():
@@ -451,6 +604,7 @@ def edit_user(user_id):
             return render_template('edit_user.html', form=form, user=user)
         
         form.populate_obj(user)
+        touch_user(user.id)  # names and roles are shown on the scoreboard
         db.session.commit()
         
         flash('User updated successfully!', 'success')
@@ -460,6 +614,11 @@ def edit_user(user_id):
 
 
 # API routes for real-time updates
+
+# Limits of the batch status endpoint
+MAX_STATUS_IDS = 100
+MAX_STATUS_WAIT = 30  # seconds
+
 @app.route('/api/submission/<int:submission_id>/status')
 @login_required
 def get_submission_status(submission_id):
@@ -470,15 +629,132 @@ def get_submission_status(submission_id):
     if submission.user_id != current_user.id and not current_user.is_judge():
         abort(403)
     
+    return jsonify(dict(submission_event(submission), judge_message=submission.judge_message))
+
+
+@app.route('/api/rejudge/<int:batch_id>')
+@login_required
+def get_rejudge_progress(batch_id):
+    """Get rejudge batch progress (AJAX)"""
+    if not current_user.is_judge():
+        abort(403)
+    
+    batch = RejudgeBatch.query.get_or_404(batch_id)
     return jsonify({
-        'status': submission.status,
-        'score': submission.score,
-        'execution_time': submission.execution_time,
-        'memory_used': submission.memory_used,
-        'judge_message': submission.judge_message
+        'total': batch.total,
+        'judged': batch.progress()
     })
 
 
+@app.route('/api/scoreboard')
+def get_scoreboard():
+    """Get the scoreboard (AJAX)"""
+    contest, snapshot = _scoreboard_snapshot()
+    if request.if_none_match.contains(snapshot.etag):
+        return _not_modified(snapshot.etag)
+    
+    response = make_response(snapshot.json)
+    response.mimetype = 'application/json'
+    response.set_etag(snapshot.etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+@app.route('/api/scoreboard/delta')
+def get_scoreboard_delta():
+    """Get the scoreboard rows changed since a version (AJAX)"""
+    since = request.args.get('since', 0, type=int)
+    contest, snapshot = _scoreboard_snapshot()
+    return jsonify(snapshot.delta(since))
+
+
+@app.route('/api/submissions/status')
+@login_required
+def get_submissions_status():
+    """Get the status of several submissions (AJAX).
+    
+    ids is a comma separated list of submission ids. When since (the cursor
+    of an earlier response) is given, the request is held for up to wait
+    seconds until one of the submissions changes after it.
+    """
+    try:
+        ids = [int(value) for value in request.args.get('ids', '').split(',') if value][:MAX_STATUS_IDS]
+    except ValueError:
+        abort(400)
+    since = request.args.get('since', type=float)
+    wait = min(request.args.get('wait', 0, type=float), MAX_STATUS_WAIT)
+    
+    if not ids:
+        return jsonify({'submissions': [], 'cursor': since})
+    
+    # Subscribe before reading so no change slips in between
+    user_id = None if current_user.is_judge() else current_user.id
+    events = notifier.subscribe(user_id) if since is not None and wait > 0 else None
+    try:
+        submissions, cursor = _submission_statuses(ids)
+        if events is not None and (cursor is None or cursor <= since):
+            deadline = time.monotonic() + wait
+            wanted = set(ids)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = events.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if event['id'] in wanted:
+                    submissions, cursor = _submission_statuses(ids)
+                    break
+    finally:
+        if events is not None:
+            notifier.unsubscribe(events)
+    
+    return jsonify({'submissions': submissions, 'cursor': cursor if cursor is not None else since})
+
+
+def _submission_statuses(ids):
+    """Status events of the listed submissions visible to the current user,
+    and the latest update time among them as a cursor"""
+    query = db.session.query(Submission.id, Submission.user_id, Submission.status, Submission.score,
+                             Submission.execution_time, Submission.memory_used, Submission.updated_at)\
+                      .filter(Submission.id.in_(ids))
+    if not current_user.is_judge():
+        query = query.filter(Submission.user_id == current_user.id)
+    rows = query.all()
+    db.session.rollback()  # end the read so a long poll does not hold a transaction open
+    
+    updated = [row.updated_at.replace(tzinfo=timezone.utc).timestamp() for row in rows if row.updated_at]
+    return [submission_event(row) for row in rows], max(updated, default=None)
+
+
+@app.route('/api/submissions/stream')
+@login_required
+def submission_stream():
+    """Push status changes of the user's submissions (Server-Sent Events)"""
+    # Judges may follow every submission, e.g. from the admin list
+    user_id = None if request.args.get('all') and current_user.is_judge() else current_user.id
+    events = notifier.subscribe(user_id)
+    
+    def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = events.get(timeout=15)
+                except queue.Empty:
+                    # Keeps proxies from closing the connection and notices
+                    # clients that went away
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'data: {json.dumps(event)}\n\n'
+        finally:
+            notifier.unsubscribe(events)
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 # Error handlers
 @app.errorhandler(404)
 def not_found_error(error):
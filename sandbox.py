@@ -0,0 +1,304 @@
+"""Process execution with resource limits and accounting for the judge.
+
+Programs are never started from the judge process itself. It runs many
+threads, where applying rlimits between fork and exec is unsafe, and a
+program exec'd from it reports the judge's own peak RSS as its ru_maxrss.
+Instead run_process hands every run to a launcher: this module run as a
+small single-threaded Python process, which forks the program in a new
+session, applies the rlimits before exec and reaps it with wait4() so the
+kernel's resource usage for the child (peak RSS, CPU time) is available to
+the caller. The kernel reports the higher of the program's own peak RSS and
+what the child inherited from the launcher, so the launcher's few MB are a
+floor on the measurement, well below the smallest memory limit.
+"""
+import atexit
+import json
+import math
+import os
+import queue
+import resource
+import select
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+
+# Markers printed by language runtimes when an allocation fails
+OUT_OF_MEMORY_MARKERS = (b'MemoryError', b'std::bad_alloc', b'java.lang.OutOfMemoryError')
+
+# Launchers run without site-packages or environment tweaks to stay small
+LAUNCHER_COMMAND = [sys.executable or 'python3', '-I', '-S', os.path.abspath(__file__)]
+
+
+def limit_resources(cpu_limit, address_space, output_limit):
+    """Build the function applying rlimits in a forked, single-threaded child"""
+    def apply_limits():
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        if output_limit:
+            resource.setrlimit(resource.RLIMIT_FSIZE, (output_limit, output_limit))
+        if cpu_limit:
+            # SIGXCPU at the soft limit, SIGKILL one second later
+            seconds = math.ceil(cpu_limit)
+            resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + 1))
+        if address_space:
+            resource.setrlimit(resource.RLIMIT_AS, (address_space, address_space))
+    return apply_limits
+
+
+def redirect_streams(stdin_path, stdout_path, stderr_path):
+    """Point the standard file descriptors of a forked child at files"""
+    streams = (
+        (0, stdin_path, os.O_RDONLY),
+        (1, stdout_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+        (2, stderr_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+    )
+    for target_fd, path, flags in streams:
+        fd = os.open(path, flags, 0o644)
+        os.dup2(fd, target_fd)
+        os.close(fd)
+
+
+def run_process(cmd, stdin_path, stdout_path, stderr_path, timeout, cpu_limit=None,
+                address_space=None, output_limit=None):
+    """Run cmd with its standard streams redirected to files.
+
+    timeout caps the wall-clock time and cpu_limit the CPU time, both in
+    seconds; address_space and output_limit, in bytes, cap the virtual
+    memory of the process and the size of any file it writes when given.
+    Returns a dict with the exit code, whether the process was killed for
+    exceeding timeout or cpu_limit or for writing too much output, the wall
+    and CPU (user + system) time in seconds and the peak resident set size
+    in KB. Raises OSError if cmd cannot be executed.
+    """
+    result = launcher_pool.request({
+        'cmd': cmd,
+        'stdin': stdin_path,
+        'stdout': stdout_path,
+        'stderr': stderr_path,
+        'timeout': timeout,
+        'cpu_limit': cpu_limit,
+        'address_space': address_space,
+        'output_limit': output_limit,
+    })
+    if 'error' in result:
+        raise OSError(result['error'])
+    return result
+
+
+def run_result(returncode, rusage, wall_time, timed_out, cpu_limit):
+    """The result dict of a finished run, see run_process"""
+    cpu_time = rusage.ru_utime + rusage.ru_stime
+    cpu_exceeded = bool(cpu_limit) and (
+        returncode == -signal.SIGXCPU or
+        (returncode == -signal.SIGKILL and cpu_time >= math.ceil(cpu_limit))
+    )
+
+    return {
+        'returncode': returncode,
+        'timed_out': timed_out or cpu_exceeded,
+        'output_exceeded': returncode == -signal.SIGXFSZ,
+        'wall_time': wall_time,
+        'cpu_time': cpu_time,
+        'max_rss': rusage.ru_maxrss,  # KB on Linux
+    }
+
+
+def wait_for_exit(pid, timeout):
+    """Wait up to timeout seconds for a child to exit without reaping it"""
+    try:
+        pidfd = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        # No pidfd support: poll
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if os.waitid(os.P_PID, pid, os.WEXITED | os.WNOHANG | os.WNOWAIT):
+                return True
+            time.sleep(0.001)
+        return False
+
+    try:
+        return bool(select.select([pidfd], [], [], timeout)[0])
+    finally:
+        os.close(pidfd)
+
+
+def supervise(pid, start_time, timeout, cpu_limit):
+    """Wait for a forked child, killing it after timeout seconds, and
+    return its run_result"""
+    timed_out = not wait_for_exit(pid, timeout)
+    if timed_out:
+        os.kill(pid, signal.SIGKILL)
+    _, status, rusage = os.wait4(pid, 0)
+    wall_time = time.monotonic() - start_time
+
+    # Kill anything the program left running in its session
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+    return run_result(os.waitstatus_to_exitcode(status), rusage, wall_time, timed_out, cpu_limit)
+
+
+def _exec_program(request, error_fd):
+    """Child side of a launcher run: never returns
+
+    Writes the error to error_fd if the program cannot be executed; the
+    pipe is closed on exec.
+    """
+    try:
+        os.setsid()
+        limit_resources(request['cpu_limit'], request['address_space'], request['output_limit'])()
+        redirect_streams(request['stdin'], request['stdout'], request['stderr'])
+        os.execvp(request['cmd'][0], request['cmd'])
+    except BaseException as e:
+        os.write(error_fd, (str(e) or type(e).__name__).encode('utf-8', 'replace'))
+    finally:
+        os._exit(127)
+
+
+def _launch(request):
+    """Launcher side of a run: fork, exec and supervise the program"""
+    start_time = time.monotonic()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        _exec_program(request, write_fd)
+
+    os.close(write_fd)
+    with open(read_fd, 'rb') as errors:
+        error = errors.read()
+    if error:
+        os.waitpid(pid, 0)
+        return {'error': error.decode('utf-8', 'replace')}
+
+    return supervise(pid, start_time, request['timeout'], request['cpu_limit'])
+
+
+def serve(handle):
+    """Fork server loop: answer each JSON request read from stdin, one per
+    line, with the JSON result of handle on stdout"""
+    requests = sys.stdin.buffer
+    responses = sys.stdout.buffer
+    for line in iter(requests.readline, b''):
+        result = handle(json.loads(line))
+        responses.write(json.dumps(result).encode('utf-8') + b'\n')
+        responses.flush()
+
+
+class ForkServerPool:
+    """Idle fork server processes (see serve), started on demand and reused
+    across requests"""
+
+    def __init__(self, command, cwd=None, name='fork server'):
+        self.command = command
+        self.cwd = cwd
+        self.name = name
+        self._idle = queue.LifoQueue()
+
+    def _spawn(self):
+        return subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                cwd=self.cwd)
+
+    def request(self, payload):
+        """Send payload to an idle server and return its response"""
+        try:
+            server = self._idle.get_nowait()
+        except queue.Empty:
+            server = self._spawn()
+
+        try:
+            server.stdin.write(json.dumps(payload).encode('utf-8') + b'\n')
+            server.stdin.flush()
+            response = server.stdout.readline()
+            if not response:
+                raise RuntimeError(f'{self.name} exited unexpectedly')
+        except BaseException:
+            server.kill()
+            server.wait()
+            raise
+
+        self._idle.put(server)
+        return json.loads(response)
+
+    def close(self):
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            server.stdin.close()
+            server.wait()
+
+
+# Launchers used by run_process
+launcher_pool = ForkServerPool(LAUNCHER_COMMAND, name='Sandbox launcher')
+atexit.register(launcher_pool.close)
+
+
+def read_tail(path, limit=4096):
+    """Return at most the last limit bytes of a file"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - limit))
+        return f.read()
+
+
+def ran_out_of_memory(run, stderr, memory_limit):
+    """Whether a finished run exceeded memory_limit (KB) or failed to allocate"""
+    if run['max_rss'] > memory_limit:
+        return True
+    return run['returncode'] != 0 and any(marker in stderr for marker in OUT_OF_MEMORY_MARKERS)
+
+
+def default_workspace_root():
+    """tmpfs when the host has one, so workspace files never touch the disk"""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+class WorkspacePool:
+    """Pre-created working directories that are emptied and reused across runs"""
+
+    def __init__(self, root, size):
+        os.makedirs(root, exist_ok=True)
+        self.root = tempfile.mkdtemp(prefix='cms-workspaces-', dir=root)
+        # Most recently released first, as its directory entries are still cached
+        self._free = queue.LifoQueue()
+        for _ in range(size):
+            self._free.put(tempfile.mkdtemp(dir=self.root))
+
+    @contextmanager
+    def workspace(self):
+        """Borrow an empty directory; grows the pool when all are in use"""
+        try:
+            path = self._free.get_nowait()
+        except queue.Empty:
+            path = tempfile.mkdtemp(dir=self.root)
+
+        try:
+            yield path
+        finally:
+            self._reset(path)
+            self._free.put(path)
+
+    @staticmethod
+    def _reset(path):
+        for entry in os.scandir(path):
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.unlink(entry.path)
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    serve(_launch)
@@ -0,0 +1,641 @@
+"""Materialized scoreboard.
+
+ScoreboardEntry holds each user's standing on each problem, and
+ScoreboardTotal holds their scoreboard row. Both are updated when one of the
+user's submissions is judged, so showing the scoreboard is an ordered scan
+of ScoreboardTotal instead of an aggregation over all submissions.
+
+Entries are recomputed from the submissions of that user and problem, not
+adjusted by a delta, so rejudges and repeated updates give the same result.
+Submissions being rejudged count with their previous verdict until the new
+one lands (judged_result).
+
+Contest scoreboards only count submissions made while the contest ran. They
+are computed on demand by one chronological pass over the contest's
+submissions (compute_contest_board), with the same per-problem rules
+(ProblemStanding) as the materialized rows. From a contest's freeze time
+the public sees a frozen board, computed once and stored with the contest,
+which is later revealed cell by cell (resolve_events).
+
+Every update also bumps the version in BoardState and stamps the changed
+ScoreboardTotal with it; updates on a contest's problems bump the contest's
+board_version too. Web processes keep snapshots of the scoreboards in
+memory (ScoreboardCache) and only reload them when those versions change,
+so spectators refreshing the page cost one primary-key read at most, and
+live clients can ask for just the rows changed since the version they have.
+"""
+import json
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from sqlalchemy import desc, func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from app import app, db
+from models import User, Submission, Problem, Contest, ScoreboardEntry, ScoreboardTotal, BoardState
+
+# Roles shown on the scoreboard
+BOARD_ROLES = ('contestant', 'admin', 'judge')
+
+# Minutes added for every rejected submission before the first accepted one
+PENALTY_PER_WRONG_ATTEMPT = 20
+
+# Verdicts that count as a judged attempt; compile errors are not charged
+_ATTEMPT_STATUSES = ('accepted', 'wrong_answer', 'time_limit', 'memory_limit', 'runtime_error')
+
+# Statuses of submissions waiting for a verdict
+_UNJUDGED_STATUSES = ('pending', 'judging')
+
+
+class ProblemStanding:
+    """A user's results on one problem, fed judged submissions in the order
+    they were submitted"""
+
+    __slots__ = ('best_score', 'submissions', 'solved', 'wrong_attempts',
+                 'first_accepted_at', 'last_accepted_at')
+
+    def __init__(self):
+        self.best_score = 0
+        self.submissions = 0
+        self.solved = False
+        self.wrong_attempts = 0
+        self.first_accepted_at = None
+        self.last_accepted_at = None
+
+    def add(self, status, score, submitted_at):
+        self.submissions += 1
+        self.best_score = max(self.best_score, score or 0)
+        if status == 'accepted':
+            if not self.solved:
+                self.solved = True
+                self.first_accepted_at = submitted_at
+            self.last_accepted_at = submitted_at
+        elif not self.solved and status in _ATTEMPT_STATUSES:
+            self.wrong_attempts += 1
+
+    def penalty(self, start_time=None, end_time=None):
+        """ICPC penalty minutes: time of the first accepted submission since
+        start_time plus PENALTY_PER_WRONG_ATTEMPT for every earlier rejection.
+
+        Time is only charged for solves between start_time and end_time,
+        so solving a contest problem in practice costs the attempts alone.
+        """
+        if not self.solved:
+            return 0
+        minutes = 0
+        if start_time is not None and start_time <= self.first_accepted_at and \
+                (end_time is None or self.first_accepted_at <= end_time):
+            minutes = int((self.first_accepted_at - start_time).total_seconds() // 60)
+        return minutes + self.wrong_attempts * PENALTY_PER_WRONG_ATTEMPT
+
+
+def judged_result(status, score, previous_status, previous_score):
+    """Verdict and score a submission counts with on the scoreboard: while
+    it is being rejudged, its previous ones; (None, None) if never judged"""
+    if status in _UNJUDGED_STATUSES:
+        return previous_status, previous_score
+    return status, score
+
+
+def rank_key(row):
+    """Scoreboard order: score, then penalty, then the earliest last solve,
+    then fewer submissions"""
+    last_solved = row['last_solved']
+    return (-row['total_score'], row['penalty'],
+            last_solved if last_solved is not None else float('inf'),
+            row['total_submissions'])
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def update_scoreboard(user_id, problem_id):
+    """Recompute the scoreboard entry of a user on a problem, and their total"""
+    for attempt in range(2):
+        try:
+            # Bump first: the version row stays locked until the commit, so
+            # changes are committed in version order
+            version = bump_scoreboard_version()
+            entry = _update_entry(user_id, problem_id)
+            if entry.contest_id is not None:
+                bump_contest_version(entry.contest_id)
+            _update_total(user_id, version)
+            db.session.commit()
+            return
+        except IntegrityError:
+            # Another judge thread created the same row first
+            db.session.rollback()
+            if attempt:
+                raise
+
+
+def _update_entry(user_id, problem_id):
+    problem = Problem.query.get(problem_id)
+    submissions = db.session.query(Submission.status, Submission.score, Submission.previous_status,
+                                   Submission.previous_score, Submission.submitted_at)\
+                            .filter(Submission.user_id == user_id,
+                                    Submission.problem_id == problem_id,
+                                    or_(Submission.status.notin_(_UNJUDGED_STATUSES),
+                                        Submission.previous_status.isnot(None)))\
+                            .order_by(Submission.submitted_at, Submission.id).all()
+
+    standing = ProblemStanding()
+    for status, score, previous_status, previous_score, submitted_at in submissions:
+        standing.add(*judged_result(status, score, previous_status, previous_score), submitted_at)
+
+    entry = ScoreboardEntry.query.filter_by(user_id=user_id, problem_id=problem_id).first()
+    if entry is None:
+        entry = ScoreboardEntry(user_id=user_id, problem_id=problem_id)
+        db.session.add(entry)
+
+    _apply_standing(entry, standing, problem.contest, datetime.utcnow())
+    db.session.flush()
+    return entry
+
+
+def _update_total(user_id, version):
+    entries = ScoreboardEntry.query.filter_by(user_id=user_id).all()
+
+    total = ScoreboardTotal.query.get(user_id)
+    if total is None:
+        total = ScoreboardTotal(user_id=user_id)
+        db.session.add(total)
+
+    _apply_total(total, entries, version, datetime.utcnow())
+    db.session.flush()
+
+
+def _apply_standing(entry, standing, contest, now):
+    """Set a ScoreboardEntry from a user's standing on a problem of contest"""
+    entry.contest_id = contest.id if contest is not None else None
+    entry.best_score = standing.best_score
+    entry.submissions = standing.submissions
+    entry.solved = standing.solved
+    entry.wrong_attempts = standing.wrong_attempts
+    if contest is not None:
+        entry.penalty = standing.penalty(contest.start_time, contest.end_time)
+    else:
+        entry.penalty = standing.penalty()
+    entry.first_accepted_at = standing.first_accepted_at
+    entry.last_accepted_at = standing.last_accepted_at
+    entry.updated_at = now
+
+
+def _apply_total(total, entries, version, now):
+    """Set a ScoreboardTotal from all of the user's entries"""
+    solved = [entry for entry in entries if entry.solved]
+    total.score = sum(entry.best_score or 0 for entry in entries)
+    total.solved = len(solved)
+    total.penalty = sum(entry.penalty or 0 for entry in solved)
+    total.submissions = sum(entry.submissions or 0 for entry in entries)
+    total.last_accepted_at = max((entry.first_accepted_at for entry in solved), default=None)
+    total.updated_at = now
+    total.version = version
+
+
+def bump_scoreboard_version():
+    """Invalidate cached scoreboards and return the new version; takes
+    effect when the session commits"""
+    result = db.session.execute(
+        update(BoardState)
+        .where(BoardState.id == 1)
+        .values(version=BoardState.version + 1, updated_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        db.session.add(BoardState(id=1, version=1))
+        db.session.flush()
+    return current_version()
+
+
+def bump_contest_version(contest_id):
+    """Invalidate cached boards of a contest; takes effect when the session
+    commits"""
+    db.session.execute(
+        update(Contest)
+        .where(Contest.id == contest_id)
+        .values(board_version=func.coalesce(Contest.board_version, 0) + 1)
+    )
+
+
+def contest_version(contest_id):
+    """Version of a contest's scoreboard in the database"""
+    version = db.session.query(Contest.board_version).filter(Contest.id == contest_id).scalar()
+    return version or 0
+
+
+def touch_user(user_id):
+    """Mark a user's scoreboard rows as changed, e.g. after a rename"""
+    version = bump_scoreboard_version()
+    db.session.execute(
+        update(ScoreboardTotal)
+        .where(ScoreboardTotal.user_id == user_id)
+        .values(version=version)
+    )
+    contests = db.session.query(ScoreboardEntry.contest_id)\
+                         .filter(ScoreboardEntry.user_id == user_id, ScoreboardEntry.contest_id.isnot(None))
+    db.session.execute(
+        update(Contest)
+        .where(Contest.id.in_(contests))
+        .values(board_version=func.coalesce(Contest.board_version, 0) + 1)
+    )
+
+
+def current_version():
+    """Version of the scoreboard in the database"""
+    version = db.session.query(BoardState.version).filter(BoardState.id == 1).scalar()
+    return version or 0
+
+
+def touch_contest(contest_id):
+    """Mark the scoreboard rows of a contest's users as changed, e.g. when
+    its scoreboard is frozen or unfrozen"""
+    version = bump_scoreboard_version()
+    bump_contest_version(contest_id)
+    users = db.session.query(ScoreboardEntry.user_id).filter(ScoreboardEntry.contest_id == contest_id)
+    db.session.execute(
+        update(ScoreboardTotal)
+        .where(ScoreboardTotal.user_id.in_(users))
+        .values(version=version)
+    )
+
+
+def load_scoreboard(frozen_contests=()):
+    """Overall scoreboard rows in rank order, as plain dicts, and the
+    versions of the rows of users not shown on the scoreboard.
+
+    Results on the problems of frozen_contests are taken from the frozen
+    boards of those contests, so the overall board does not show what the
+    contest boards hide.
+    """
+    rows = db.session.query(
+        User.id,
+        User.username,
+        User.full_name,
+        User.role,
+        ScoreboardTotal.submissions,
+        ScoreboardTotal.solved,
+        ScoreboardTotal.score,
+        ScoreboardTotal.penalty,
+        ScoreboardTotal.last_accepted_at,
+        ScoreboardTotal.version
+    ).select_from(ScoreboardTotal)\
+     .join(User, ScoreboardTotal.user_id == User.id)\
+     .order_by(desc(ScoreboardTotal.score), ScoreboardTotal.penalty,
+               ScoreboardTotal.last_accepted_at.is_(None), ScoreboardTotal.last_accepted_at,
+               ScoreboardTotal.submissions)\
+     .all()
+
+    frozen_totals = _frozen_totals(frozen_contests) if frozen_contests else {}
+
+    visible = []
+    hidden = {}
+    for row in rows:
+        if row.role not in BOARD_ROLES:
+            hidden[row.id] = row.version or 0
+            continue
+        visible.append({
+            'id': row.id,
+            'username': row.username,
+            'full_name': row.full_name,
+            'total_submissions': row.submissions or 0,
+            'solved_problems': row.solved or 0,
+            'total_score': row.score or 0,
+            'penalty': row.penalty or 0,
+            'last_solved': _timestamp(row.last_accepted_at),
+            'version': row.version or 0,
+        })
+        totals = frozen_totals.get(row.id)
+        if totals is not None:
+            visible[-1].update(totals)
+
+    if frozen_totals:
+        visible.sort(key=rank_key)
+    return visible, hidden
+
+
+def _frozen_totals(contests):
+    """Overall totals of the users with results in the given contests,
+    counting their cells on each contest's frozen board instead of their
+    live results on its problems"""
+    contest_ids = [contest.id for contest in contests]
+    cells = defaultdict(list)
+    for contest in contests:
+        _, _, rows = frozen_contest_board(contest)
+        for row in rows:
+            cells[row['id']].extend(cell for cell in row['problems'] if cell)
+
+    users = db.session.query(ScoreboardEntry.user_id).filter(ScoreboardEntry.contest_id.in_(contest_ids))
+    entries = ScoreboardEntry.query.filter(
+        ScoreboardEntry.user_id.in_(users),
+        or_(ScoreboardEntry.contest_id.is_(None), ScoreboardEntry.contest_id.notin_(contest_ids))
+    )
+    affected = {user_id for (user_id,) in users}
+    for entry in entries:
+        solved_at = entry.first_accepted_at if entry.solved else None
+        cells[entry.user_id].append({
+            'score': entry.best_score or 0,
+            'solved': bool(entry.solved),
+            'penalty': entry.penalty or 0,
+            'submissions': entry.submissions or 0,
+            'solved_at': _timestamp(solved_at),
+        })
+
+    totals = {}
+    for user_id in affected:
+        row = contest_row(user_id, None, None, cells[user_id])
+        totals[user_id] = {name: row[name] for name in
+                           ('total_submissions', 'solved_problems', 'total_score', 'penalty', 'last_solved')}
+    return totals
+
+
+def compute_contest_board(contest, freeze_time=None):
+    """Scoreboard rows of a contest in rank order, counting the submissions
+    made while it ran.
+
+    With freeze_time, submissions from then on, and earlier ones still
+    waiting for a verdict, are not applied but counted as pending in their
+    cells, as on a frozen scoreboard. Rows carry
+    per-problem cells in the order of the contest's problems, which are
+    returned alongside as plain dicts.
+    """
+    problems = Problem.query.filter_by(contest_id=contest.id).order_by(Problem.code).all()
+    if not problems:
+        return [], []
+
+    stream = db.session.query(Submission.user_id, Submission.problem_id, Submission.status,
+                              Submission.score, Submission.previous_status, Submission.previous_score,
+                              Submission.submitted_at)\
+                       .filter(Submission.problem_id.in_([problem.id for problem in problems]),
+                               Submission.submitted_at >= contest.start_time,
+                               Submission.submitted_at <= contest.end_time)\
+                       .order_by(Submission.submitted_at, Submission.id)\
+                       .yield_per(5000)
+
+    standings = defaultdict(dict)
+    pending = defaultdict(lambda: defaultdict(int))
+    for user_id, problem_id, status, score, previous_status, previous_score, submitted_at in stream:
+        frozen = freeze_time is not None and submitted_at >= freeze_time
+        status, score = judged_result(status, score, previous_status, previous_score)
+        if freeze_time is None and status is None:
+            continue
+        standing = standings[user_id].get(problem_id)
+        if standing is None:
+            standing = standings[user_id][problem_id] = ProblemStanding()
+        if frozen or status is None:
+            pending[user_id][problem_id] += 1
+        else:
+            standing.add(status, score, submitted_at)
+
+    users = User.query.filter(User.id.in_(list(standings)), User.role.in_(BOARD_ROLES)).all() \
+        if standings else []
+
+    rows = []
+    for user in users:
+        cells = []
+        for problem in problems:
+            standing = standings[user.id].get(problem.id)
+            cells.append(_cell(standing, pending[user.id][problem.id], contest.start_time)
+                         if standing is not None else None)
+        rows.append(contest_row(user.id, user.username, user.full_name, cells))
+
+    rows.sort(key=rank_key)
+    return [{'id': problem.id, 'code': problem.code, 'title': problem.title} for problem in problems], rows
+
+
+def _cell(standing, pending, start_time):
+    solved_at = standing.first_accepted_at if standing.solved else None
+    return {
+        'score': standing.best_score,
+        'solved': standing.solved,
+        'tries': standing.wrong_attempts + (1 if standing.solved else 0),
+        'minutes': int((solved_at - start_time).total_seconds() // 60) if solved_at else None,
+        'penalty': standing.penalty(start_time),
+        'submissions': standing.submissions,
+        'solved_at': _timestamp(solved_at),
+        'pending': pending,
+    }
+
+
+def contest_row(user_id, username, full_name, cells):
+    """A contest scoreboard row, with totals summed from its cells"""
+    present = [cell for cell in cells if cell]
+    solved = [cell for cell in present if cell['solved']]
+    return {
+        'id': user_id,
+        'username': username,
+        'full_name': full_name,
+        'total_submissions': sum(cell['submissions'] for cell in present),
+        'solved_problems': len(solved),
+        'total_score': sum(cell['score'] for cell in present),
+        'penalty': sum(cell['penalty'] for cell in solved),
+        'last_solved': max((cell['solved_at'] for cell in solved), default=None),
+        'problems': cells,
+    }
+
+
+def frozen_contest_board(contest):
+    """The stored frozen scoreboard of a contest as (version, problems,
+    rows), computing and storing it on first use"""
+    if contest.frozen_board:
+        board = json.loads(contest.frozen_board)
+        return board['version'], board['problems'], board['rows']
+
+    version = current_version()
+    problems, rows = compute_contest_board(contest, contest.freeze_time)
+    contest.frozen_board = json.dumps({'version': version, 'problems': problems, 'rows': rows})
+    db.session.commit()
+    return version, problems, rows
+
+
+def resolve_events(frozen_rows, live_rows):
+    """Replay the reveal of a frozen scoreboard, ICPC resolver style.
+
+    Starting from the frozen rows, the lowest ranked row with pending cells
+    has its first pending cell replaced by the live one, and so on until
+    nothing is pending. Yields one event per reveal, with the new cell, the
+    row's new totals and its new position; only the two snapshots are used.
+    """
+    live_cells = {row['id']: row['problems'] for row in live_rows}
+    rows = [dict(row, problems=list(row['problems'])) for row in frozen_rows]
+    rows.sort(key=rank_key)
+
+    while True:
+        position = next((i for i in range(len(rows) - 1, -1, -1)
+                         if any(cell and cell['pending'] for cell in rows[i]['problems'])), None)
+        if position is None:
+            return
+
+        row = rows.pop(position)
+        index = next(i for i, cell in enumerate(row['problems']) if cell and cell['pending'])
+        cells = list(row['problems'])
+        live = live_cells.get(row['id'])
+        cells[index] = live[index] if live and live[index] else dict(cells[index], pending=0)
+        row = contest_row(row['id'], row['username'], row['full_name'], cells)
+
+        key = rank_key(row)
+        position = next((i for i, other in enumerate(rows) if key < rank_key(other)), len(rows))
+        rows.insert(position, row)
+        yield {'user_id': row['id'], 'problem': index, 'cell': cells[index],
+               'row': {name: value for name, value in row.items() if name != 'problems'},
+               'rank': position + 1}
+
+
+class Snapshot:
+    """Scoreboard rows at a given version, with their JSON encoding.
+
+    Rows of the overall board carry the version of their last change, so
+    deltas only hold changed rows; contest boards are recomputed as a whole
+    and their deltas hold every row. A frozen board keeps the version it
+    was frozen at, so clients see no changes until it is unfrozen.
+    """
+
+    def __init__(self, version, rows, hidden=None, problems=None, loaded_version=None,
+                 name='scoreboard'):
+        self.version = version
+        self.rows = rows
+        self.hidden = hidden
+        self.problems = problems
+        self.loaded_version = version if loaded_version is None else loaded_version
+        self.board_version = None  # contest board_version it was loaded at
+        self.frozen = loaded_version is not None
+        self.json = json.dumps({'version': version, 'rows': rows})
+        self.etag = f'{name}-frozen-{version}' if self.frozen else f'{name}-{version}'
+
+    def delta(self, since):
+        """Rows changed after version since, and ids of users whose rows
+        were removed from the scoreboard since then"""
+        if self.hidden is None:
+            changed = since < self.version
+            return {'version': self.version, 'full': True,
+                    'rows': self.rows if changed else [], 'removed': []}
+
+        return {
+            'version': self.version,
+            'full': False,
+            'rows': [row for row in self.rows if row['version'] > since],
+            'removed': [user_id for user_id, version in self.hidden.items() if version > since],
+        }
+
+
+class ScoreboardCache:
+    """Per-process scoreboard snapshots, reloaded when the version changes.
+
+    There is one snapshot for the overall board, and a live and a frozen
+    one per contest. The database version is checked at most once per
+    check_interval. When it has changed, a contest's snapshots are only
+    reloaded if the contest's own board_version changed too, so judgements
+    elsewhere do not recompute its board. Only one thread reloads a given
+    stale snapshot; the others wanting it wait and share the result, while
+    other snapshots are served and reloaded independently. Frozen boards
+    are computed once and stored with the contest, so reloading them is a
+    single read.
+    """
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._snapshots = {}
+        self._checked_at = 0
+        self._version = 0
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def get(self, contest_id=None, frozen=False):
+        """Snapshot of the overall board, or of a contest's live or frozen
+        board; the frozen overall board is the public one, which counts
+        frozen contests as their frozen boards do"""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self._version = current_version()
+            self._checked_at = time.monotonic()
+
+        key = (contest_id, frozen)
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None and snapshot.loaded_version >= self._version:
+            return snapshot
+
+        with self._lock_for(key):
+            snapshot = self._snapshots.get(key)
+            if snapshot is None or snapshot.loaded_version < self._version:
+                # Read the versions first: a change during the load makes the
+                # snapshot look older than it is, never newer
+                version = current_version()
+                board_version = contest_version(contest_id) if contest_id is not None else None
+                if snapshot is not None and board_version is not None and \
+                        snapshot.board_version == board_version:
+                    snapshot.loaded_version = version
+                else:
+                    snapshot = self._load(version, contest_id, frozen)
+                    snapshot.board_version = board_version
+                    self._snapshots[key] = snapshot
+            return snapshot
+
+    def _lock_for(self, key):
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _load(self, version, contest_id, frozen):
+        if contest_id is None:
+            if not frozen:
+                return Snapshot(version, *load_scoreboard())
+            # Contests freezing later change no rows until their next
+            # judgement, which bumps the version and reloads this board
+            contests = [contest for contest in Contest.query.filter(Contest.freeze_time.isnot(None))
+                        if contest.is_frozen()]
+            return Snapshot(version, *load_scoreboard(contests), name='scoreboard-public')
+        contest = Contest.query.get(contest_id)
+        if frozen:
+            frozen_version, problems, rows = frozen_contest_board(contest)
+            return Snapshot(frozen_version, rows, problems=problems, loaded_version=version)
+        problems, rows = compute_contest_board(contest)
+        return Snapshot(version, rows, problems=problems)
+
+
+scoreboard_cache = ScoreboardCache(app.config['SCOREBOARD_VERSION_CHECK_INTERVAL'])
+
+
+def rebuild_scoreboard():
+    """Recompute the whole scoreboard from the submissions table.
+
+    All submissions are read in one chronological pass, and every entry
+    and total is replaced in a single commit. The version row is bumped
+    first, so judgements made meanwhile wait for the rebuild. Returns the
+    number of user/problem pairs.
+    """
+    version = bump_scoreboard_version()
+    contests = {problem.id: problem.contest
+                for problem in Problem.query.options(joinedload(Problem.contest))}
+
+    stream = db.session.query(Submission.user_id, Submission.problem_id, Submission.status,
+                              Submission.score, Submission.previous_status, Submission.previous_score,
+                              Submission.submitted_at)\
+                       .order_by(Submission.submitted_at, Submission.id)\
+                       .yield_per(5000)
+    standings = defaultdict(ProblemStanding)
+    for user_id, problem_id, status, score, previous_status, previous_score, submitted_at in stream:
+        status, score = judged_result(status, score, previous_status, previous_score)
+        if status is not None:
+            standings[user_id, problem_id].add(status, score, submitted_at)
+
+    now = datetime.utcnow()
+    entries = defaultdict(list)
+    for (user_id, problem_id), standing in standings.items():
+        entry = ScoreboardEntry(user_id=user_id, problem_id=problem_id)
+        _apply_standing(entry, standing, contests.get(problem_id), now)
+        entries[user_id].append(entry)
+
+    totals = []
+    for user_id, user_entries in entries.items():
+        total = ScoreboardTotal(user_id=user_id)
+        _apply_total(total, user_entries, version, now)
+        totals.append(total)
+
+    ScoreboardEntry.query.delete()
+    ScoreboardTotal.query.delete()
+    db.session.add_all([entry for user_entries in entries.values() for entry in user_entries])
+    db.session.add_all(totals)
+    db.session.execute(update(Contest).values(board_version=func.coalesce(Contest.board_version, 0) + 1))
+    db.session.commit()
+    return len(standings)
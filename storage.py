@@ -0,0 +1,88 @@
+"""Content-addressed storage for test data.
+
+Test inputs and expected outputs are stored as files named by the SHA-256
+of their content; the database only keeps the hash and size. Files live in
+a local data directory by default, or in an S3-compatible bucket.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from app import app
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class LocalStorage:
+    """Test data files in a local directory, sharded by hash prefix"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, data):
+        """Store data and return its (hash, size)"""
+        digest = content_hash(data)
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so readers never see a partial file
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return digest, len(data)
+
+    def open(self, digest):
+        return open(self.path(digest), 'rb')
+
+    def fetch(self, digest, dest_path):
+        shutil.copyfile(self.path(digest), dest_path)
+
+
+class S3Storage:
+    """Test data objects in an S3-compatible bucket (requires boto3)"""
+
+    def __init__(self, bucket, prefix='', endpoint_url=None):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError('S3 test data storage requires the boto3 package')
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _key(self, digest):
+        return f'{self.prefix}{digest[:2]}/{digest}'
+
+    def put(self, data):
+        """Store data and return its (hash, size)"""
+        digest = content_hash(data)
+        self.client.put_object(Bucket=self.bucket, Key=self._key(digest), Body=data)
+        return digest, len(data)
+
+    def open(self, digest):
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(digest))['Body']
+
+    def fetch(self, digest, dest_path):
+        self.client.download_file(self.bucket, self._key(digest), dest_path)
+
+
+_storage = None
+
+
+def get_storage():
+    """The test data storage configured by TESTDATA_STORAGE"""
+    global _storage
+    if _storage is None:
+        if app.config['TESTDATA_STORAGE'] == 's3':
+            _storage = S3Storage(app.config['TESTDATA_S3_BUCKET'],
+                                 prefix=app.config['TESTDATA_S3_PREFIX'],
+                                 endpoint_url=app.config['TESTDATA_S3_ENDPOINT'])
+        else:
+            _storage = LocalStorage(app.config['TESTDATA_DIR'])
+    return _storage
@@ -0,0 +1,98 @@
+"""Judge-host cache of test data files.
+
+Test files are copied from test data storage to local disk once, verified
+against their content hash, and then opened directly as the stdin of test
+runs. Files already on local disk (LocalStorage) are verified in place
+rather than copied.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from storage import LocalStorage
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TestDataCache:
+    """Verified local copies of test data, keyed by content hash"""
+
+    def __init__(self, root, storage):
+        self.root = root
+        self.storage = storage
+        self._verified = set()
+        self._problem_files = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _local_path(self, digest):
+        if isinstance(self.storage, LocalStorage):
+            return self.storage.path(digest)
+        return os.path.join(self.root, digest)
+
+    def path(self, digest):
+        """Local path of a verified copy of the file with the given hash"""
+        path = self._local_path(digest)
+        if digest in self._verified:
+            return path
+
+        with self._lock:
+            if digest in self._verified:
+                return path
+
+            if os.path.exists(path) and file_hash(path) == digest:
+                self._verified.add(digest)
+                return path
+
+            if isinstance(self.storage, LocalStorage):
+                raise RuntimeError(f'Test data file {digest} is missing or corrupt')
+
+            # Download beside the final path, then verify and rename
+            fd, temp_path = tempfile.mkstemp(dir=self.root, prefix='.download-')
+            os.close(fd)
+            try:
+                self.storage.fetch(digest, temp_path)
+                if file_hash(temp_path) != digest:
+                    raise RuntimeError(f'Checksum mismatch for test data file {digest}')
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+            self._verified.add(digest)
+            return path
+
+    def prefetch(self, problem_id, test_cases):
+        """Make a problem's test files local, dropping files of replaced tests"""
+        digests = {digest for test_case in test_cases
+                   for digest in (test_case.input_hash, test_case.output_hash)}
+
+        with self._lock:
+            previous = self._problem_files.get(problem_id)
+            if previous == digests:
+                return
+            self._problem_files[problem_id] = digests
+            still_used = set().union(*self._problem_files.values())
+
+        for digest in digests:
+            self.path(digest)
+
+        if previous:
+            for digest in previous - still_used:
+                self.forget(digest)
+
+    def forget(self, digest):
+        """Drop a file from the cache"""
+        with self._lock:
+            self._verified.discard(digest)
+            if not isinstance(self.storage, LocalStorage):
+                try:
+                    os.remove(self._local_path(digest))
+                except FileNotFoundError:
+                    pass
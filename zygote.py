@@ -0,0 +1,112 @@
+"""Fork server for Python 3 submissions.
+
+A zygote is a Python process that has already paid the interpreter startup
+cost (site, encodings and common standard library modules). For every test
+run it forks a child that applies the usual rlimits, redirects its standard
+streams and executes the submission as __main__, so a 50-test problem starts
+the interpreter once instead of 50 times.
+
+The judge talks to zygotes through ZygotePool; each zygote reads one JSON
+request per line on stdin and answers with the same result dict as
+sandbox.run_process on stdout. Memory is accounted the same way too: the
+peak RSS of the process running the submission, as reported by wait4().
+That includes the warm interpreter and its preloaded modules, a couple of
+MB more than a freshly started python3.
+"""
+import os
+import sys
+import time
+
+from sandbox import ForkServerPool, limit_resources, redirect_streams, serve, supervise
+
+# Interpreter used for zygotes, matching the python3 run command of the judge
+PYTHON = 'python3'
+
+# Standard library modules commonly imported by solutions
+PRELOADED_MODULES = (
+    'bisect', 'collections', 'functools', 'heapq', 'io', 'itertools',
+    'math', 're', 'runpy', 'string', 'traceback',
+)
+
+
+def _exec_submission(request):
+    """Child side of a run: never returns"""
+    exit_code = 1
+    try:
+        os.setsid()
+        limit_resources(request['cpu_limit'], request['address_space'], request['output_limit'])()
+
+        redirect_streams(request['stdin'], request['stdout'], request['stderr'])
+
+        # Fresh standard streams, as a newly started interpreter would have
+        sys.stdin = sys.__stdin__ = open(0, 'r', encoding='utf-8', closefd=False)
+        sys.stdout = sys.__stdout__ = open(1, 'w', encoding='utf-8', closefd=False)
+        sys.stderr = sys.__stderr__ = open(2, 'w', encoding='utf-8', errors='backslashreplace',
+                                           closefd=False, buffering=1)
+
+        import runpy
+        import traceback
+
+        source = request['source']
+        sys.argv = [source]
+        sys.path[0] = os.path.dirname(source)
+        try:
+            runpy.run_path(source, run_name='__main__')
+            exit_code = 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                exit_code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+        except BaseException:
+            traceback.print_exc()
+
+        try:
+            sys.stdout.flush()
+        except Exception:
+            traceback.print_exc()
+            exit_code = exit_code or 1
+        sys.stderr.flush()
+    finally:
+        os._exit(exit_code)
+
+
+def _run(request):
+    """Zygote side of a run: fork, supervise and reap the child"""
+    start_time = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        _exec_submission(request)
+    return supervise(pid, start_time, request['timeout'], request['cpu_limit'])
+
+
+def _serve():
+    for module in PRELOADED_MODULES:
+        __import__(module)
+    serve(_run)
+
+
+class ZygotePool(ForkServerPool):
+    """Idle zygote processes, started on demand and reused across runs"""
+
+    def __init__(self):
+        super().__init__([PYTHON, os.path.abspath(__file__)],
+                         cwd=os.path.dirname(os.path.abspath(__file__)), name='Python zygote')
+
+    def run(self, source, stdin_path, stdout_path, stderr_path, timeout, cpu_limit=None,
+            address_space=None, output_limit=None):
+        """Run a Python source file like sandbox.run_process would run `python3 source`"""
+        return self.request({
+            'source': source,
+            'stdin': stdin_path,
+            'stdout': stdout_path,
+            'stderr': stderr_path,
+            'timeout': timeout,
+            'cpu_limit': cpu_limit,
+            'address_space': address_space,
+            'output_limit': output_limit,
+        })
+
+
+if __name__ == '__main__':
+    _serve()